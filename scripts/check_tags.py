@@ -2,11 +2,27 @@
 """
 Script to check AWS resources and their tags for the agent-pipeline bookmark.
 This will help identify which resources should appear in the UI when filtering by Application=agent-pipeline.
+
+By default matching resources are found with a single Resource Groups Tagging API
+query; pass --full to walk every resource of each service and fetch its tags.
+
+Usage:
+    ./check_tags.py            # Tagging API query only, no per-service calls
+    ./check_tags.py --full     # Per-service listing and tag lookup for every resource
+    ./check_tags.py --verbose  # Also write every resource checked to an NDJSON file
 """
 
+import argparse
 import boto3
+import io
 import json
+import re
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import nullcontext
 from datetime import datetime
+from functools import lru_cache
 from botocore.config import Config
 
 # Configuration from bookmark
@@ -15,86 +31,233 @@ REGION = "us-east-1"
 TAG_KEY = "Application"
 TAG_VALUE = "agent-pipeline"
 
-# Create boto3 config with retries
+# ARN prefixes for resources whose ARN is built from their listed name or id
+ARN_CODEPIPELINE_PREFIX = f"arn:aws:codepipeline:{REGION}:{ACCOUNT_ID}:"
+ARN_CODECOMMIT_PREFIX = f"arn:aws:codecommit:{REGION}:{ACCOUNT_ID}:"
+ARN_SSM_PARAMETER_PREFIX = f"arn:aws:ssm:{REGION}:{ACCOUNT_ID}:parameter/"
+ARN_LOG_GROUP_PREFIX = f"arn:aws:logs:{REGION}:{ACCOUNT_ID}:log-group:"
+ARN_COGNITO_USER_POOL_PREFIX = f"arn:aws:cognito-idp:{REGION}:{ACCOUNT_ID}:userpool/"
+ARN_COGNITO_IDENTITY_POOL_PREFIX = f"arn:aws:cognito-identity:{REGION}:{ACCOUNT_ID}:identitypool/"
+ARN_REST_API_PREFIX = f"arn:aws:apigateway:{REGION}::/restapis/"
+ARN_HTTP_API_PREFIX = f"arn:aws:apigateway:{REGION}::/apis/"
+
+# Discard non-matching resources as soon as their tags are known (off with --verbose)
+ONLY_MATCHING = True
+
+# Concurrent tag lookups, shared by all checkers
+TAG_FETCH_WORKERS = 32
+
+# Create boto3 config with retries. Adaptive mode rate-limits the client when the
+# concurrent lookups get throttled. Each client gets one pooled connection per
+# tag-fetch worker, otherwise the lookups queue on connection acquisition, and
+# keep-alive stops idle pooled connections from being dropped mid-run.
 config = Config(
-    retries={'max_attempts': 3, 'mode': 'standard'},
-    region_name=REGION
+    retries={'max_attempts': 10, 'mode': 'adaptive'},
+    region_name=REGION,
+    max_pool_connections=TAG_FETCH_WORKERS,
+    tcp_keepalive=True
 )
 
-def get_session():
-    """Get boto3 session - assumes credentials are already configured."""
-    return boto3.Session(region_name=REGION)
-
-def check_s3_buckets(session):
-    """Check S3 buckets and their tags."""
-    s3 = session.client('s3', config=config)
+# Resource Groups Tagging API resource types queried in the default mode, and the
+# CloudFormation type each (service, resource type) ARN pair maps to
+TAGGING_API_RESOURCE_TYPE_FILTERS = [
+    's3',
+    'lambda:function',
+    'codebuild:project',
+    'codepipeline',
+    'codecommit',
+    'sns',
+    'ssm:parameter',
+    'logs:log-group',
+    'cognito-idp:userpool',
+    'cognito-identity:identitypool',
+    'apigateway',
+]
+
+TAGGING_API_RESOURCE_TYPES = {
+    ('s3', ''): 'AWS::S3::Bucket',
+    ('lambda', 'function'): 'AWS::Lambda::Function',
+    ('codebuild', 'project'): 'AWS::CodeBuild::Project',
+    ('codepipeline', ''): 'AWS::CodePipeline::Pipeline',
+    ('codecommit', ''): 'AWS::CodeCommit::Repository',
+    ('sns', ''): 'AWS::SNS::Topic',
+    ('ssm', 'parameter'): 'AWS::SSM::Parameter',
+    ('logs', 'log-group'): 'AWS::Logs::LogGroup',
+    ('cognito-idp', 'userpool'): 'AWS::Cognito::UserPool',
+    ('cognito-identity', 'identitypool'): 'AWS::Cognito::IdentityPool',
+    ('apigateway', 'restapis'): 'AWS::ApiGateway::RestApi',
+    ('apigateway', 'apis'): 'AWS::ApiGatewayV2::Api',
+}
+
+# boto3 session - assumes credentials are already configured
+SESSION = boto3.Session(region_name=REGION)
+
+# boto3 sessions are not thread-safe, so clients are created one at a time.
+# The clients themselves are thread-safe and shared by every checker.
+client_lock = threading.Lock()
+
+@lru_cache(maxsize=None)
+def create_client(service):
+    return SESSION.client(service, config=config)
+
+def get_client(service):
+    """Get the shared client for a service, creating it on first use."""
+    with client_lock:
+        return create_client(service)
+
+def parse_resource_arn(arn):
+    """Split an ARN into (service, resource type, resource id)."""
+    _, _, service, _, _, resource = arn.split(':', 5)
+    match = re.match(r'([^:/]*)[:/](.*)', resource.lstrip('/'))
+    if match is None:
+        return service, '', resource
+    return service, match.group(1), match.group(2)
+
+def check_via_tagging_api():
+    """Find tagged resources with one Resource Groups Tagging API query."""
+    tagging = get_client('resourcegroupstaggingapi')
     results = []
 
     try:
-        response = s3.list_buckets()
-        for bucket in response.get('Buckets', []):
-            bucket_name = bucket['Name']
-            try:
-                # Get bucket location to filter by region
-                location = s3.get_bucket_location(Bucket=bucket_name)
-                bucket_region = location.get('LocationConstraint') or 'us-east-1'
-
-                # Get tags
-                try:
-                    tag_response = s3.get_bucket_tagging(Bucket=bucket_name)
-                    tags = {t['Key']: t['Value'] for t in tag_response.get('TagSet', [])}
-                except s3.exceptions.ClientError:
-                    tags = {}
-
+        paginator = tagging.get_paginator('get_resources')
+        pages = paginator.paginate(
+            TagFilters=[{'Key': TAG_KEY, 'Values': [TAG_VALUE]}],
+            ResourceTypeFilters=TAGGING_API_RESOURCE_TYPE_FILTERS,
+            PaginationConfig={'PageSize': 100}
+        )
+        for page in pages:
+            for mapping in page.get('ResourceTagMappingList', []):
+                resource_arn = mapping['ResourceARN']
+                service, resource_type, resource_id = parse_resource_arn(resource_arn)
+
+                cfn_type = TAGGING_API_RESOURCE_TYPES.get((service, resource_type))
+                # API Gateway stages and other sub-resources share the service prefix
+                if cfn_type is None or (service == 'apigateway' and '/' in resource_id):
+                    continue
+                # Hierarchical parameter names start with '/', which their ARNs drop
+                if cfn_type == 'AWS::SSM::Parameter' and '/' in resource_id:
+                    resource_id = '/' + resource_id
+
+                tags = {t['Key']: t['Value'] for t in mapping.get('Tags', [])}
                 has_app_tag = tags.get(TAG_KEY) == TAG_VALUE
                 results.append({
-                    'type': 'AWS::S3::Bucket',
-                    'id': bucket_name,
-                    'region': bucket_region,
+                    'type': cfn_type,
+                    'id': resource_id,
+                    'arn': resource_arn,
                     'tags': tags,
                     'has_app_tag': has_app_tag
                 })
-            except Exception as e:
-                print(f"  Error checking bucket {bucket_name}: {e}")
+    except Exception as e:
+        print(f"Error querying Resource Groups Tagging API: {e}")
+
+    return results
+
+# One pool for every checker's tag lookups, so the threads are reused across
+# services and the number of in-flight calls stays bounded for the whole run
+tag_fetch_executor = ThreadPoolExecutor(max_workers=TAG_FETCH_WORKERS)
+
+def fetch_tags_by_arn(arns):
+    """Look up tags for many ARNs with batched Resource Groups Tagging API calls.
+
+    Returns one tag dict per ARN, in order. Resources that were never tagged are
+    absent from the tagging API and get {}.
+    """
+    tagging = get_client('resourcegroupstaggingapi')
+
+    def fetch_batch(batch):
+        batch_tags = {}
+        try:
+            paginator = tagging.get_paginator('get_resources')
+            for page in paginator.paginate(ResourceARNList=batch):
+                for mapping in page.get('ResourceTagMappingList', []):
+                    batch_tags[mapping['ResourceARN']] = {t['Key']: t['Value'] for t in mapping.get('Tags', [])}
+        except Exception as e:
+            print(f"  Error fetching tags for {len(batch)} resources: {e}")
+        return batch_tags
+
+    # get_resources accepts at most 100 ARNs per call
+    batches = [arns[i:i + 100] for i in range(0, len(arns), 100)]
+    tags_by_arn = {}
+    for batch_tags in tag_fetch_executor.map(fetch_batch, batches):
+        tags_by_arn.update(batch_tags)
+
+    return [tags_by_arn.get(arn, {}) for arn in arns]
+
+def check_s3_buckets():
+    """Check S3 buckets in REGION and their tags."""
+    s3 = get_client('s3')
+    results = []
+
+    def probe(bucket):
+        bucket_name = bucket['Name']
+        try:
+            # Get bucket location first so buckets in other regions skip the tag call
+            location = s3.get_bucket_location(Bucket=bucket_name)
+            bucket_region = location.get('LocationConstraint') or 'us-east-1'
+            if bucket_region != REGION:
+                return None
+
+            # Get tags
+            try:
+                tag_response = s3.get_bucket_tagging(Bucket=bucket_name)
+                tags = {t['Key']: t['Value'] for t in tag_response.get('TagSet', [])}
+            except s3.exceptions.ClientError:
+                tags = {}
+
+            has_app_tag = tags.get(TAG_KEY) == TAG_VALUE
+            if not has_app_tag and ONLY_MATCHING:
+                return None
+            return {
+                'type': 'AWS::S3::Bucket',
+                'id': bucket_name,
+                'region': bucket_region,
+                'tags': tags,
+                'has_app_tag': has_app_tag
+            }
+        except Exception as e:
+            print(f"  Error checking bucket {bucket_name}: {e}")
+            return None
+
+    try:
+        response = s3.list_buckets()
+        buckets = response.get('Buckets', [])
+        results = [r for r in tag_fetch_executor.map(probe, buckets) if r is not None]
     except Exception as e:
         print(f"Error listing S3 buckets: {e}")
 
     return results
 
-def check_lambda_functions(session):
+def check_lambda_functions():
     """Check Lambda functions and their tags."""
-    lambda_client = session.client('lambda', config=config)
+    lambda_client = get_client('lambda')
     results = []
 
     try:
+        functions = []
         paginator = lambda_client.get_paginator('list_functions')
-        for page in paginator.paginate():
-            for func in page.get('Functions', []):
-                func_name = func['FunctionName']
-                func_arn = func['FunctionArn']
-
-                try:
-                    tag_response = lambda_client.list_tags(Resource=func_arn)
-                    tags = tag_response.get('Tags', {})
-                except Exception:
-                    tags = {}
+        for page in paginator.paginate(PaginationConfig={'PageSize': 50}):
+            functions.extend(page.get('Functions', []))
 
-                has_app_tag = tags.get(TAG_KEY) == TAG_VALUE
-                results.append({
-                    'type': 'AWS::Lambda::Function',
-                    'id': func_name,
-                    'arn': func_arn,
-                    'tags': tags,
-                    'has_app_tag': has_app_tag
-                })
+        func_arns = [func['FunctionArn'] for func in functions]
+        for func, tags in zip(functions, fetch_tags_by_arn(func_arns)):
+            has_app_tag = tags.get(TAG_KEY) == TAG_VALUE
+            if not has_app_tag and ONLY_MATCHING:
+                continue
+            results.append({
+                'type': 'AWS::Lambda::Function',
+                'id': func['FunctionName'],
+                'arn': func['FunctionArn'],
+                'tags': tags,
+                'has_app_tag': has_app_tag
+            })
     except Exception as e:
         print(f"Error listing Lambda functions: {e}")
 
     return results
 
-def check_codebuild_projects(session):
+def check_codebuild_projects():
     """Check CodeBuild projects and their tags."""
-    codebuild = session.client('codebuild', config=config)
+    codebuild = get_client('codebuild')
     results = []
 
     try:
@@ -113,6 +276,8 @@ def check_codebuild_projects(session):
                     tags = {t['key']: t['value'] for t in project.get('tags', [])}
 
                     has_app_tag = tags.get(TAG_KEY) == TAG_VALUE
+                    if not has_app_tag and ONLY_MATCHING:
+                        continue
                     results.append({
                         'type': 'AWS::CodeBuild::Project',
                         'id': project_name,
@@ -125,221 +290,216 @@ def check_codebuild_projects(session):
 
     return results
 
-def check_codepipeline_pipelines(session):
+def check_codepipeline_pipelines():
     """Check CodePipeline pipelines and their tags."""
-    codepipeline = session.client('codepipeline', config=config)
+    codepipeline = get_client('codepipeline')
     results = []
 
     try:
+        pipeline_names = []
         paginator = codepipeline.get_paginator('list_pipelines')
-        for page in paginator.paginate():
-            for pipeline in page.get('pipelines', []):
-                pipeline_name = pipeline['name']
-                pipeline_arn = f"arn:aws:codepipeline:{REGION}:{ACCOUNT_ID}:{pipeline_name}"
+        for page in paginator.paginate(PaginationConfig={'PageSize': 1000}):
+            pipeline_names.extend(p['name'] for p in page.get('pipelines', []))
 
-                try:
-                    tag_response = codepipeline.list_tags_for_resource(resourceArn=pipeline_arn)
-                    tags = {t['key']: t['value'] for t in tag_response.get('tags', [])}
-                except Exception:
-                    tags = {}
+        pipeline_arns = [ARN_CODEPIPELINE_PREFIX + name for name in pipeline_names]
 
-                has_app_tag = tags.get(TAG_KEY) == TAG_VALUE
-                results.append({
-                    'type': 'AWS::CodePipeline::Pipeline',
-                    'id': pipeline_name,
-                    'arn': pipeline_arn,
-                    'tags': tags,
-                    'has_app_tag': has_app_tag
-                })
+        tag_results = fetch_tags_by_arn(pipeline_arns)
+        for pipeline_name, pipeline_arn, tags in zip(pipeline_names, pipeline_arns, tag_results):
+            has_app_tag = tags.get(TAG_KEY) == TAG_VALUE
+            if not has_app_tag and ONLY_MATCHING:
+                continue
+            results.append({
+                'type': 'AWS::CodePipeline::Pipeline',
+                'id': pipeline_name,
+                'arn': pipeline_arn,
+                'tags': tags,
+                'has_app_tag': has_app_tag
+            })
     except Exception as e:
         print(f"Error listing CodePipeline pipelines: {e}")
 
     return results
 
-def check_codecommit_repos(session):
+def check_codecommit_repos():
     """Check CodeCommit repositories and their tags."""
-    codecommit = session.client('codecommit', config=config)
+    codecommit = get_client('codecommit')
     results = []
 
     try:
+        repo_names = []
         paginator = codecommit.get_paginator('list_repositories')
         for page in paginator.paginate():
-            for repo in page.get('repositories', []):
-                repo_name = repo['repositoryName']
-                repo_arn = f"arn:aws:codecommit:{REGION}:{ACCOUNT_ID}:{repo_name}"
+            repo_names.extend(r['repositoryName'] for r in page.get('repositories', []))
 
-                try:
-                    tag_response = codecommit.list_tags_for_resource(resourceArn=repo_arn)
-                    tags = tag_response.get('tags', {})
-                except Exception:
-                    tags = {}
+        repo_arns = [ARN_CODECOMMIT_PREFIX + name for name in repo_names]
 
-                has_app_tag = tags.get(TAG_KEY) == TAG_VALUE
-                results.append({
-                    'type': 'AWS::CodeCommit::Repository',
-                    'id': repo_name,
-                    'arn': repo_arn,
-                    'tags': tags,
-                    'has_app_tag': has_app_tag
-                })
+        tag_results = fetch_tags_by_arn(repo_arns)
+        for repo_name, repo_arn, tags in zip(repo_names, repo_arns, tag_results):
+            has_app_tag = tags.get(TAG_KEY) == TAG_VALUE
+            if not has_app_tag and ONLY_MATCHING:
+                continue
+            results.append({
+                'type': 'AWS::CodeCommit::Repository',
+                'id': repo_name,
+                'arn': repo_arn,
+                'tags': tags,
+                'has_app_tag': has_app_tag
+            })
     except Exception as e:
         print(f"Error listing CodeCommit repositories: {e}")
 
     return results
 
-def check_sns_topics(session):
+def check_sns_topics():
     """Check SNS topics and their tags."""
-    sns = session.client('sns', config=config)
+    sns = get_client('sns')
     results = []
 
     try:
+        topic_arns = []
         paginator = sns.get_paginator('list_topics')
         for page in paginator.paginate():
-            for topic in page.get('Topics', []):
-                topic_arn = topic['TopicArn']
-                topic_name = topic_arn.split(':')[-1]
+            topic_arns.extend(t['TopicArn'] for t in page.get('Topics', []))
 
-                try:
-                    tag_response = sns.list_tags_for_resource(ResourceArn=topic_arn)
-                    tags = {t['Key']: t['Value'] for t in tag_response.get('Tags', [])}
-                except Exception:
-                    tags = {}
-
-                has_app_tag = tags.get(TAG_KEY) == TAG_VALUE
-                results.append({
-                    'type': 'AWS::SNS::Topic',
-                    'id': topic_name,
-                    'arn': topic_arn,
-                    'tags': tags,
-                    'has_app_tag': has_app_tag
-                })
+        for topic_arn, tags in zip(topic_arns, fetch_tags_by_arn(topic_arns)):
+            has_app_tag = tags.get(TAG_KEY) == TAG_VALUE
+            if not has_app_tag and ONLY_MATCHING:
+                continue
+            results.append({
+                'type': 'AWS::SNS::Topic',
+                'id': topic_arn.split(':')[-1],
+                'arn': topic_arn,
+                'tags': tags,
+                'has_app_tag': has_app_tag
+            })
     except Exception as e:
         print(f"Error listing SNS topics: {e}")
 
     return results
 
-def check_ssm_parameters(session):
+def check_ssm_parameters():
     """Check SSM parameters and their tags."""
-    ssm = session.client('ssm', config=config)
+    ssm = get_client('ssm')
     results = []
 
     try:
-        paginator = ssm.get_paginator('describe_parameters')
-        for page in paginator.paginate():
-            for param in page.get('Parameters', []):
-                param_name = param['Name']
-                param_arn = f"arn:aws:ssm:{REGION}:{ACCOUNT_ID}:parameter{param_name}"
-
-                try:
-                    tag_response = ssm.list_tags_for_resource(
-                        ResourceType='Parameter',
-                        ResourceId=param_name
-                    )
-                    tags = {t['Key']: t['Value'] for t in tag_response.get('TagList', [])}
-                except Exception:
-                    tags = {}
-
-                has_app_tag = tags.get(TAG_KEY) == TAG_VALUE
-                results.append({
-                    'type': 'AWS::SSM::Parameter',
-                    'id': param_name,
-                    'arn': param_arn,
-                    'tags': tags,
-                    'has_app_tag': has_app_tag
-                })
+        # Page manually - the describe_parameters paginator is slow on large accounts
+        param_names = []
+        kwargs = {'MaxResults': 50}
+        while True:
+            response = ssm.describe_parameters(**kwargs)
+            param_names.extend(p['Name'] for p in response.get('Parameters', []))
+            if 'NextToken' not in response:
+                break
+            kwargs['NextToken'] = response['NextToken']
+
+        param_arns = [ARN_SSM_PARAMETER_PREFIX + name.lstrip('/') for name in param_names]
+
+        tag_results = fetch_tags_by_arn(param_arns)
+        for param_name, param_arn, tags in zip(param_names, param_arns, tag_results):
+            has_app_tag = tags.get(TAG_KEY) == TAG_VALUE
+            if not has_app_tag and ONLY_MATCHING:
+                continue
+            results.append({
+                'type': 'AWS::SSM::Parameter',
+                'id': param_name,
+                'arn': param_arn,
+                'tags': tags,
+                'has_app_tag': has_app_tag
+            })
     except Exception as e:
         print(f"Error listing SSM parameters: {e}")
 
     return results
 
-def check_logs_log_groups(session):
+def check_logs_log_groups():
     """Check CloudWatch Log Groups and their tags."""
-    logs = session.client('logs', config=config)
+    logs = get_client('logs')
     results = []
 
     try:
-        paginator = logs.get_paginator('describe_log_groups')
-        for page in paginator.paginate():
-            for lg in page.get('logGroups', []):
-                lg_name = lg['logGroupName']
-                lg_arn = lg.get('arn', f"arn:aws:logs:{REGION}:{ACCOUNT_ID}:log-group:{lg_name}")
-
-                try:
-                    tag_response = logs.list_tags_for_resource(resourceArn=lg_arn)
-                    tags = tag_response.get('tags', {})
-                except Exception:
-                    tags = {}
-
-                has_app_tag = tags.get(TAG_KEY) == TAG_VALUE
-                results.append({
-                    'type': 'AWS::Logs::LogGroup',
-                    'id': lg_name,
-                    'arn': lg_arn,
-                    'tags': tags,
-                    'has_app_tag': has_app_tag
-                })
+        # Page manually - the describe_log_groups paginator is slow on large accounts
+        log_groups = []
+        kwargs = {'limit': 50}
+        while True:
+            response = logs.describe_log_groups(**kwargs)
+            log_groups.extend(response.get('logGroups', []))
+            if 'nextToken' not in response:
+                break
+            kwargs['nextToken'] = response['nextToken']
+
+        lg_names = [lg['logGroupName'] for lg in log_groups]
+        # logGroupArn omits the trailing ':*' of arn, matching the tagging API's ARNs
+        lg_arns = [lg.get('logGroupArn') or ARN_LOG_GROUP_PREFIX + lg['logGroupName'] for lg in log_groups]
+
+        tag_results = fetch_tags_by_arn(lg_arns)
+        for lg_name, lg_arn, tags in zip(lg_names, lg_arns, tag_results):
+            has_app_tag = tags.get(TAG_KEY) == TAG_VALUE
+            if not has_app_tag and ONLY_MATCHING:
+                continue
+            results.append({
+                'type': 'AWS::Logs::LogGroup',
+                'id': lg_name,
+                'arn': lg_arn,
+                'tags': tags,
+                'has_app_tag': has_app_tag
+            })
     except Exception as e:
         print(f"Error listing CloudWatch Log Groups: {e}")
 
     return results
 
-def check_cognito_user_pools(session):
+def check_cognito_user_pools():
     """Check Cognito User Pools and their tags."""
-    cognito = session.client('cognito-idp', config=config)
+    cognito = get_client('cognito-idp')
     results = []
 
     try:
+        pools = []
         paginator = cognito.get_paginator('list_user_pools')
         for page in paginator.paginate(MaxResults=60):
-            for pool in page.get('UserPools', []):
-                pool_id = pool['Id']
-                pool_name = pool['Name']
-                pool_arn = f"arn:aws:cognito-idp:{REGION}:{ACCOUNT_ID}:userpool/{pool_id}"
-
-                try:
-                    # Get detailed info including tags
-                    detail = cognito.describe_user_pool(UserPoolId=pool_id)
-                    tags = detail.get('UserPool', {}).get('UserPoolTags', {})
-                except Exception:
-                    tags = {}
+            pools.extend(page.get('UserPools', []))
 
-                has_app_tag = tags.get(TAG_KEY) == TAG_VALUE
-                results.append({
-                    'type': 'AWS::Cognito::UserPool',
-                    'id': pool_id,
-                    'name': pool_name,
-                    'arn': pool_arn,
-                    'tags': tags,
-                    'has_app_tag': has_app_tag
-                })
+        pool_arns = [ARN_COGNITO_USER_POOL_PREFIX + pool['Id'] for pool in pools]
+
+        tag_results = fetch_tags_by_arn(pool_arns)
+        for pool, pool_arn, tags in zip(pools, pool_arns, tag_results):
+            has_app_tag = tags.get(TAG_KEY) == TAG_VALUE
+            if not has_app_tag and ONLY_MATCHING:
+                continue
+            results.append({
+                'type': 'AWS::Cognito::UserPool',
+                'id': pool['Id'],
+                'name': pool['Name'],
+                'arn': pool_arn,
+                'tags': tags,
+                'has_app_tag': has_app_tag
+            })
     except Exception as e:
         print(f"Error listing Cognito User Pools: {e}")
 
     return results
 
-def check_cognito_identity_pools(session):
+def check_cognito_identity_pools():
     """Check Cognito Identity Pools and their tags."""
-    cognito_identity = session.client('cognito-identity', config=config)
+    cognito_identity = get_client('cognito-identity')
     results = []
 
     try:
         response = cognito_identity.list_identity_pools(MaxResults=60)
-        for pool in response.get('IdentityPools', []):
-            pool_id = pool['IdentityPoolId']
-            pool_name = pool['IdentityPoolName']
-            pool_arn = f"arn:aws:cognito-identity:{REGION}:{ACCOUNT_ID}:identitypool/{pool_id}"
+        pools = response.get('IdentityPools', [])
 
-            try:
-                tag_response = cognito_identity.list_tags_for_resource(ResourceArn=pool_arn)
-                tags = tag_response.get('Tags', {})
-            except Exception:
-                tags = {}
+        pool_arns = [ARN_COGNITO_IDENTITY_POOL_PREFIX + pool['IdentityPoolId'] for pool in pools]
 
+        tag_results = fetch_tags_by_arn(pool_arns)
+        for pool, pool_arn, tags in zip(pools, pool_arns, tag_results):
             has_app_tag = tags.get(TAG_KEY) == TAG_VALUE
+            if not has_app_tag and ONLY_MATCHING:
+                continue
             results.append({
                 'type': 'AWS::Cognito::IdentityPool',
-                'id': pool_id,
-                'name': pool_name,
+                'id': pool['IdentityPoolId'],
+                'name': pool['IdentityPoolName'],
                 'arn': pool_arn,
                 'tags': tags,
                 'has_app_tag': has_app_tag
@@ -349,21 +509,23 @@ def check_cognito_identity_pools(session):
 
     return results
 
-def check_api_gateway_rest_apis(session):
+def check_api_gateway_rest_apis():
     """Check API Gateway REST APIs and their tags."""
-    apigateway = session.client('apigateway', config=config)
+    apigateway = get_client('apigateway')
     results = []
 
     try:
         paginator = apigateway.get_paginator('get_rest_apis')
-        for page in paginator.paginate():
+        for page in paginator.paginate(PaginationConfig={'PageSize': 500}):
             for api in page.get('items', []):
                 api_id = api['id']
                 api_name = api.get('name', api_id)
-                api_arn = f"arn:aws:apigateway:{REGION}::/restapis/{api_id}"
+                api_arn = ARN_REST_API_PREFIX + api_id
                 tags = api.get('tags', {})
 
                 has_app_tag = tags.get(TAG_KEY) == TAG_VALUE
+                if not has_app_tag and ONLY_MATCHING:
+                    continue
                 results.append({
                     'type': 'AWS::ApiGateway::RestApi',
                     'id': api_id,
@@ -377,72 +539,135 @@ def check_api_gateway_rest_apis(session):
 
     return results
 
-def check_api_gateway_v2_apis(session):
+def check_api_gateway_v2_apis():
     """Check API Gateway V2 APIs and their tags."""
-    apigatewayv2 = session.client('apigatewayv2', config=config)
+    apigatewayv2 = get_client('apigatewayv2')
     results = []
 
     try:
-        response = apigatewayv2.get_apis()
-        for api in response.get('Items', []):
-            api_id = api['ApiId']
-            api_name = api.get('Name', api_id)
-            api_arn = f"arn:aws:apigateway:{REGION}::/apis/{api_id}"
-            tags = api.get('Tags', {})
+        # get_apis returns a single page unless NextToken is followed
+        response = apigatewayv2.get_apis(MaxResults='500')
+        while True:
+            for api in response.get('Items', []):
+                api_id = api['ApiId']
+                api_name = api.get('Name', api_id)
+                api_arn = ARN_HTTP_API_PREFIX + api_id
+                tags = api.get('Tags', {})
 
-            has_app_tag = tags.get(TAG_KEY) == TAG_VALUE
-            results.append({
-                'type': 'AWS::ApiGatewayV2::Api',
-                'id': api_id,
-                'name': api_name,
-                'arn': api_arn,
-                'tags': tags,
-                'has_app_tag': has_app_tag
-            })
+                has_app_tag = tags.get(TAG_KEY) == TAG_VALUE
+                if not has_app_tag and ONLY_MATCHING:
+                    continue
+                results.append({
+                    'type': 'AWS::ApiGatewayV2::Api',
+                    'id': api_id,
+                    'name': api_name,
+                    'arn': api_arn,
+                    'tags': tags,
+                    'has_app_tag': has_app_tag
+                })
+
+            if 'NextToken' not in response:
+                break
+            response = apigatewayv2.get_apis(MaxResults='500', NextToken=response['NextToken'])
     except Exception as e:
         print(f"Error listing API Gateway V2 APIs: {e}")
 
     return results
 
+# Per-service checkers, each listing every resource and fetching its tags (--full),
+# with the clients each one uses
+SERVICE_CHECKERS = [
+    ("S3 Buckets", check_s3_buckets, ['s3']),
+    ("Lambda Functions", check_lambda_functions, ['lambda', 'resourcegroupstaggingapi']),
+    ("CodeBuild Projects", check_codebuild_projects, ['codebuild']),
+    ("CodePipeline Pipelines", check_codepipeline_pipelines, ['codepipeline', 'resourcegroupstaggingapi']),
+    ("CodeCommit Repositories", check_codecommit_repos, ['codecommit', 'resourcegroupstaggingapi']),
+    ("SNS Topics", check_sns_topics, ['sns', 'resourcegroupstaggingapi']),
+    ("SSM Parameters", check_ssm_parameters, ['ssm', 'resourcegroupstaggingapi']),
+    ("CloudWatch Log Groups", check_logs_log_groups, ['logs', 'resourcegroupstaggingapi']),
+    ("Cognito User Pools", check_cognito_user_pools, ['cognito-idp', 'resourcegroupstaggingapi']),
+    ("Cognito Identity Pools", check_cognito_identity_pools, ['cognito-identity', 'resourcegroupstaggingapi']),
+    ("API Gateway REST APIs", check_api_gateway_rest_apis, ['apigateway']),
+    ("API Gateway V2 APIs", check_api_gateway_v2_apis, ['apigatewayv2']),
+]
+
+# Default mode: a single tagging API query covering every service above
+TAGGING_API_CHECKER = (
+    "Tagged Resources (Resource Groups Tagging API)", check_via_tagging_api, ['resourcegroupstaggingapi']
+)
+
 def main():
+    parser = argparse.ArgumentParser(
+        description=f'Check which AWS resources carry the {TAG_KEY}={TAG_VALUE} tag'
+    )
+
+    parser.add_argument(
+        '--full',
+        action='store_true',
+        help='List every resource per service and fetch its tags instead of querying the tagging API'
+    )
+
+    parser.add_argument(
+        '--verbose', '-v',
+        action='store_true',
+        help='Keep non-matching resources and write every resource checked to an NDJSON file'
+    )
+
+    args = parser.parse_args()
+
+    global ONLY_MATCHING
+    ONLY_MATCHING = not args.verbose
+
     print(f"Checking AWS resources in account {ACCOUNT_ID}, region {REGION}")
     print(f"Looking for tag: {TAG_KEY}={TAG_VALUE}")
     print("=" * 80)
 
-    session = get_session()
-
-    all_results = []
-
-    # Check each resource type
-    checkers = [
-        ("S3 Buckets", check_s3_buckets),
-        ("Lambda Functions", check_lambda_functions),
-        ("CodeBuild Projects", check_codebuild_projects),
-        ("CodePipeline Pipelines", check_codepipeline_pipelines),
-        ("CodeCommit Repositories", check_codecommit_repos),
-        ("SNS Topics", check_sns_topics),
-        ("SSM Parameters", check_ssm_parameters),
-        ("CloudWatch Log Groups", check_logs_log_groups),
-        ("Cognito User Pools", check_cognito_user_pools),
-        ("Cognito Identity Pools", check_cognito_identity_pools),
-        ("API Gateway REST APIs", check_api_gateway_rest_apis),
-        ("API Gateway V2 APIs", check_api_gateway_v2_apis),
-    ]
-
-    for name, checker in checkers:
-        print(f"\nChecking {name}...")
-        results = checker(session)
-        all_results.extend(results)
-
-        matching = [r for r in results if r['has_app_tag']]
-        print(f"  Found {len(results)} total, {len(matching)} with Application=agent-pipeline tag")
-
-    # Summary
-    print("\n" + "=" * 80)
-    print("SUMMARY: Resources with Application=agent-pipeline tag")
-    print("=" * 80)
-
-    matching_resources = [r for r in all_results if r['has_app_tag']]
+    matching_resources = []
+    total_count = 0
+
+    # With --verbose every resource is streamed to an NDJSON file as its checker
+    # finishes, so only the matching resources are held until the end
+    all_resources_file = "/tmp/tag_check_all_resources.ndjson"
+
+    # Check each resource type concurrently - the checkers hit independent endpoints
+    checkers = SERVICE_CHECKERS if args.full else [TAGGING_API_CHECKER]
+
+    # Create the clients up front so the checker threads start sending requests at
+    # once instead of queueing on client_lock. Clients come from one session, which
+    # is not thread-safe, so they are created here one after another.
+    for service in {service for _, _, services in checkers for service in services}:
+        get_client(service)
+
+    with open(all_resources_file, 'w') if args.verbose else nullcontext() as all_resources_out, \
+            ThreadPoolExecutor(max_workers=len(checkers)) as executor:
+        futures = {
+            executor.submit(checker): name
+            for name, checker, _ in checkers
+        }
+        for future in as_completed(futures):
+            name = futures[future]
+            results = future.result()
+
+            matching = [r for r in results if r['has_app_tag']]
+            matching_resources.extend(matching)
+            total_count += len(results)
+
+            if all_resources_out is not None:
+                for r in results:
+                    all_resources_out.write(json.dumps(r))
+                    all_resources_out.write('\n')
+
+            if ONLY_MATCHING:
+                found = f"Found {len(matching)} with Application=agent-pipeline tag"
+            else:
+                found = f"Found {len(results)} total, {len(matching)} with Application=agent-pipeline tag"
+            print(f"\nChecked {name}...\n  {found}")
+
+    # Summary - built in memory and written to stdout in one go
+    summary = io.StringIO()
+    print("\n" + "=" * 80, file=summary)
+    print("SUMMARY: Resources with Application=agent-pipeline tag", file=summary)
+    print("=" * 80, file=summary)
 
     # Group by type
     by_type = {}
@@ -454,33 +679,40 @@ def main():
 
     for resource_type in sorted(by_type.keys()):
         resources = by_type[resource_type]
-        print(f"\n{resource_type} ({len(resources)}):")
+        print(f"\n{resource_type} ({len(resources)}):", file=summary)
         for r in resources:
             name = r.get('name', r['id'])
-            print(f"  - {name} (id: {r['id']})")
+            print(f"  - {name} (id: {r['id']})", file=summary)
             if r['tags']:
                 app_tag = r['tags'].get(TAG_KEY, 'N/A')
-                print(f"    Tags: Application={app_tag}")
+                print(f"    Tags: Application={app_tag}", file=summary)
 
-    print("\n" + "=" * 80)
-    print(f"TOTAL: {len(matching_resources)} resources should appear in UI with Application=agent-pipeline filter")
-    print("=" * 80)
+    print("\n" + "=" * 80, file=summary)
+    print(f"TOTAL: {len(matching_resources)} resources should appear in UI with Application=agent-pipeline filter", file=summary)
+    print("=" * 80, file=summary)
+    sys.stdout.write(summary.getvalue())
 
-    # Save detailed results to JSON
+    # Save detailed results to JSON - pretty-printed only with --verbose
     output_file = "/tmp/tag_check_results.json"
+    results_summary = {
+        'timestamp': datetime.now().isoformat(),
+        'account': ACCOUNT_ID,
+        'region': REGION,
+        'tag_filter': f"{TAG_KEY}={TAG_VALUE}",
+        'matching_count': len(matching_resources),
+        'matching_resources': matching_resources,
+    }
     with open(output_file, 'w') as f:
-        json.dump({
-            'timestamp': datetime.now().isoformat(),
-            'account': ACCOUNT_ID,
-            'region': REGION,
-            'tag_filter': f"{TAG_KEY}={TAG_VALUE}",
-            'matching_count': len(matching_resources),
-            'total_count': len(all_results),
-            'matching_resources': matching_resources,
-            'all_resources': all_results
-        }, f, indent=2, default=str)
+        if args.verbose:
+            results_summary['total_count'] = total_count
+            results_summary['all_resources_file'] = all_resources_file
+            json.dump(results_summary, f, indent=2)
+        else:
+            json.dump(results_summary, f, separators=(',', ':'))
 
     print(f"\nDetailed results saved to: {output_file}")
+    if args.verbose:
+        print(f"All resources saved to: {all_resources_file}")
 
 if __name__ == "__main__":
     main()
@@ -17,9 +17,18 @@ import os
 import re
 import urllib.request
 import gzip
+from fnmatch import fnmatchcase
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
-from collections import defaultdict
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from itertools import groupby
+from concurrent.futures import ThreadPoolExecutor
+
+# orjson parses the multi-megabyte resource spec several times faster when installed
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    json_loads = json.loads
 
 # Configuration
 HOME = Path.home()
@@ -27,6 +36,10 @@ RESOURCE_SPEC_DIR = HOME / ".config" / "awsdash" / "cfn-resources"
 RESOURCE_SPEC_FILE = RESOURCE_SPEC_DIR / "us-east-1.json"
 RESOURCE_SPEC_URL = "https://d1uauaxba7bl26.cloudfront.net/latest/gzip/CloudFormationResourceSpecification.json"
 
+# Icon index cache, reused while the icon sets are unchanged (delete it to force a rescan)
+ICON_INDEX_CACHE_FILE = HOME / ".config" / "awsdash" / "icon-index.json"
+ICON_INDEX_CACHE_VERSION = 1
+
 # Icon directories (relative to the project root)
 ICONS_BASE_DIR = Path("assets/Icons")
 ARCH_SERVICE_ICONS_PATTERN = "Architecture-Service-Icons_*"
@@ -39,178 +52,302 @@ OUTPUT_FILE = Path("src/app/cfn_resource_icons.rs")
 # Icon size preference order
 ICON_SIZE_PREFERENCE = ["16", "32", "48", "64"]
 
+# Size tokens in icon paths (e.g. Res_48_Light/, _48.png) marking the preferred resource and group icon sizes
+RESOURCE_ICON_SIZE_PATTERN = re.compile(r'(?:^|[/_-])48(?:[/_.-]|$)')
+GROUP_ICON_SIZE_PATTERN = re.compile(r'(?:^|[/_-])32(?:[/_.-]|$)')
+
+# Threads used to walk the icon sets concurrently
+ICON_SCAN_WORKERS = 16
+
 def download_resource_spec() -> dict:
     """Download CloudFormation resource specification if not cached."""
     if RESOURCE_SPEC_FILE.exists():
         print(f"Using cached resource specification from {RESOURCE_SPEC_FILE}")
-        with open(RESOURCE_SPEC_FILE, 'r') as f:
-            return json.load(f)
+        return json_loads(RESOURCE_SPEC_FILE.read_bytes())
     
     print(f"Downloading CloudFormation resource specification from AWS...")
     RESOURCE_SPEC_DIR.mkdir(parents=True, exist_ok=True)
     
-    # Download as gzipped file first
-    gz_file = RESOURCE_SPEC_FILE.with_suffix('.json.gz')
-    urllib.request.urlretrieve(RESOURCE_SPEC_URL, gz_file)
-    
-    # Decompress
-    with gzip.open(gz_file, 'rb') as f_in:
-        with open(RESOURCE_SPEC_FILE, 'wb') as f_out:
-            f_out.write(f_in.read())
+    # Decompress the gzipped spec as it streams in and write the cache once
+    request = urllib.request.Request(RESOURCE_SPEC_URL, headers={"Accept-Encoding": "gzip"})
+    with urllib.request.urlopen(request) as response:
+        with gzip.GzipFile(fileobj=response) as f_in:
+            spec_bytes = f_in.read()
     
-    # Remove gz file
-    gz_file.unlink()
+    RESOURCE_SPEC_FILE.write_bytes(spec_bytes)
     print(f"Downloaded and extracted to {RESOURCE_SPEC_FILE}")
     
-    with open(RESOURCE_SPEC_FILE, 'r') as f:
-        return json.load(f)
+    return json_loads(spec_bytes)
 
 def get_all_resource_types(spec: dict) -> List[str]:
     """Extract all resource types from the specification."""
-    resource_types = list(spec.get("ResourceTypes", {}).keys())
+    resource_types = set(spec.get("ResourceTypes", {}))
     
     # Also include property types as some might be referenced
-    property_types = list(spec.get("PropertyTypes", {}).keys())
-    
-    # Filter property types to get unique service resources
-    for prop_type in property_types:
-        parts = prop_type.split(".")
-        if len(parts) >= 2:
-            base_resource = "::".join(parts[0].split("::")[:-1] + [parts[0].split("::")[-1]])
-            if base_resource not in resource_types:
-                resource_types.append(base_resource)
-    
-    return sorted(set(resource_types))
-
-def normalize_service_name(service: str) -> List[str]:
-    """Generate possible icon name variations for a service."""
-    variations = []
-    
-    # Original name
-    variations.append(service)
-    
-    # Handle special cases
-    service_mappings = {
-        "EC2": ["EC2", "Elastic-Compute-Cloud", "Amazon-EC2"],
-        "S3": ["S3", "Simple-Storage-Service", "Amazon-Simple-Storage-Service"],
-        "RDS": ["RDS", "Amazon-RDS", "Relational-Database-Service"],
-        "Lambda": ["Lambda", "AWS-Lambda"],
-        "DynamoDB": ["DynamoDB", "Amazon-DynamoDB"],
-        "CloudFormation": ["CloudFormation", "AWS-CloudFormation"],
-        "CloudWatch": ["CloudWatch", "Amazon-CloudWatch"],
-        "CloudTrail": ["CloudTrail", "AWS-CloudTrail"],
-        "SNS": ["SNS", "Simple-Notification-Service", "Amazon-Simple-Notification-Service"],
-        "SQS": ["SQS", "Simple-Queue-Service", "Amazon-Simple-Queue-Service"],
-        "IAM": ["IAM", "Identity-and-Access-Management", "AWS-Identity-and-Access-Management"],
-        "KMS": ["KMS", "Key-Management-Service", "AWS-Key-Management-Service"],
-        "ECS": ["ECS", "Elastic-Container-Service", "Amazon-Elastic-Container-Service"],
-        "EKS": ["EKS", "Elastic-Kubernetes-Service", "Amazon-Elastic-Kubernetes-Service"],
-        "ECR": ["ECR", "Elastic-Container-Registry", "Amazon-Elastic-Container-Registry"],
-        "ElastiCache": ["ElastiCache", "Amazon-ElastiCache"],
-        "ElasticLoadBalancing": ["Elastic-Load-Balancing", "ELB"],
-        "ElasticLoadBalancingV2": ["Elastic-Load-Balancing", "ELB"],
-        "AutoScaling": ["Auto-Scaling", "EC2-Auto-Scaling", "Amazon-EC2-Auto-Scaling"],
-        "ApiGateway": ["API-Gateway", "Amazon-API-Gateway"],
-        "ApiGatewayV2": ["API-Gateway", "Amazon-API-Gateway"],
-        "Cognito": ["Cognito", "Amazon-Cognito"],
-        "SecretsManager": ["Secrets-Manager", "AWS-Secrets-Manager"],
-        "EventBridge": ["EventBridge", "Amazon-EventBridge"],
-        "Events": ["EventBridge", "Amazon-EventBridge"],
-        "StepFunctions": ["Step-Functions", "AWS-Step-Functions"],
-        "Glue": ["Glue", "AWS-Glue"],
-        "SageMaker": ["SageMaker", "Amazon-SageMaker", "Amazon-SageMaker-AI"],
-        "CodePipeline": ["CodePipeline", "AWS-CodePipeline"],
-        "CodeBuild": ["CodeBuild", "AWS-CodeBuild"],
-        "CodeCommit": ["CodeCommit", "AWS-CodeCommit"],
-        "CodeDeploy": ["CodeDeploy", "AWS-CodeDeploy"],
-        "Kinesis": ["Kinesis", "Amazon-Kinesis"],
-        "KinesisFirehose": ["Kinesis", "Data-Firehose", "Amazon-Data-Firehose"],
-        "KinesisAnalytics": ["Kinesis", "Managed-Service-for-Apache-Flink"],
-        "Athena": ["Athena", "Amazon-Athena"],
-        "Redshift": ["Redshift", "Amazon-Redshift"],
-        "EFS": ["EFS", "Elastic-File-System", "Amazon-Elastic-File-System"],
-        "Backup": ["Backup", "AWS-Backup"],
-        "WAF": ["WAF", "AWS-WAF"],
-        "WAFv2": ["WAF", "AWS-WAF"],
-        "Config": ["Config", "AWS-Config"],
-        "SSM": ["Systems-Manager", "AWS-Systems-Manager"],
-        "AppSync": ["AppSync", "AWS-AppSync"],
-        "Amplify": ["Amplify", "AWS-Amplify"],
-        "ElasticBeanstalk": ["Elastic-Beanstalk", "AWS-Elastic-Beanstalk"],
-        "OpenSearchService": ["OpenSearch-Service", "Amazon-OpenSearch-Service"],
-        "IoT": ["IoT", "AWS-IoT", "AWS-IoT-Core"],
-        "MSK": ["MSK", "Managed-Streaming-for-Apache-Kafka", "Amazon-Managed-Streaming-for-Apache-Kafka"],
-        "DocDB": ["DocumentDB", "Amazon-DocumentDB"],
-        "Neptune": ["Neptune", "Amazon-Neptune"],
-        "QLDB": ["QLDB", "Quantum-Ledger-Database", "Amazon-Quantum-Ledger-Database"],
-        "Timestream": ["Timestream", "Amazon-Timestream"],
-        "Route53": ["Route-53", "Amazon-Route-53"],
-        "CloudFront": ["CloudFront", "Amazon-CloudFront"],
-        "ACM": ["Certificate-Manager", "AWS-Certificate-Manager"],
-        "AppFlow": ["AppFlow", "Amazon-AppFlow"],
-        "AppConfig": ["AppConfig", "AWS-AppConfig"],
-        "Batch": ["Batch", "AWS-Batch"],
-        "DataSync": ["DataSync", "AWS-DataSync"],
-        "DMS": ["Database-Migration-Service", "AWS-Database-Migration-Service"],
-        "EMR": ["EMR", "Amazon-EMR"],
-        "FSx": ["FSx", "Amazon-FSx"],
-        "GameLift": ["GameLift", "Amazon-GameLift"],
-        "Macie": ["Macie", "Amazon-Macie"],
-        "MQ": ["MQ", "Amazon-MQ"],
-        "QuickSight": ["QuickSight", "Amazon-QuickSight"],
-        "WorkSpaces": ["WorkSpaces", "Amazon-WorkSpaces"],
-        "LakeFormation": ["Lake-Formation", "AWS-Lake-Formation"],
-        "DataExchange": ["Data-Exchange", "AWS-Data-Exchange"],
-        "FinSpace": ["FinSpace", "Amazon-FinSpace"],
-        "Forecast": ["Forecast", "Amazon-Forecast"],
-        "Comprehend": ["Comprehend", "Amazon-Comprehend"],
-        "Translate": ["Translate", "Amazon-Translate"],
-        "Transcribe": ["Transcribe", "Amazon-Transcribe"],
-        "Rekognition": ["Rekognition", "Amazon-Rekognition"],
-        "Textract": ["Textract", "Amazon-Textract"],
-        "Polly": ["Polly", "Amazon-Polly"],
-        "Lex": ["Lex", "Amazon-Lex"],
-        "Connect": ["Connect", "Amazon-Connect"],
-        "Pinpoint": ["Pinpoint", "Amazon-Pinpoint"],
-        "SES": ["SES", "Simple-Email-Service", "Amazon-Simple-Email-Service"],
-        "Chime": ["Chime", "Amazon-Chime"],
-        "WorkMail": ["WorkMail", "Amazon-WorkMail"],
-        "Shield": ["Shield", "AWS-Shield"],
-        "GuardDuty": ["GuardDuty", "Amazon-GuardDuty"],
-        "Inspector": ["Inspector", "Amazon-Inspector"],
-        "SecurityHub": ["Security-Hub", "AWS-Security-Hub"],
-        "Artifact": ["Artifact", "AWS-Artifact"],
-        "Audit": ["Audit-Manager", "AWS-Audit-Manager"],
-        "ControlTower": ["Control-Tower", "AWS-Control-Tower"],
-        "Organizations": ["Organizations", "AWS-Organizations"],
-        "ResourceGroups": ["Resource-Groups", "AWS-Resource-Groups"],
-        "ServiceCatalog": ["Service-Catalog", "AWS-Service-Catalog"],
-        "CloudMap": ["Cloud-Map", "AWS-Cloud-Map"],
-        "AppMesh": ["App-Mesh", "AWS-App-Mesh"],
-        "XRay": ["X-Ray", "AWS-X-Ray"],
-        "DevOpsGuru": ["DevOps-Guru", "Amazon-DevOps-Guru"],
-    }
+    # (e.g. AWS::EC2::Instance.BlockDeviceMapping -> AWS::EC2::Instance)
+    for prop_type in spec.get("PropertyTypes", {}):
+        base_resource, separator, _ = prop_type.partition(".")
+        if separator:
+            resource_types.add(base_resource)
     
+    return sorted(resource_types)
+
+# Icon name variations for services whose icons do not follow the CloudFormation name
+SERVICE_MAPPINGS = {
+    "EC2": ["EC2", "Elastic-Compute-Cloud", "Amazon-EC2"],
+    "S3": ["S3", "Simple-Storage-Service", "Amazon-Simple-Storage-Service"],
+    "RDS": ["RDS", "Amazon-RDS", "Relational-Database-Service"],
+    "Lambda": ["Lambda", "AWS-Lambda"],
+    "DynamoDB": ["DynamoDB", "Amazon-DynamoDB"],
+    "CloudFormation": ["CloudFormation", "AWS-CloudFormation"],
+    "CloudWatch": ["CloudWatch", "Amazon-CloudWatch"],
+    "CloudTrail": ["CloudTrail", "AWS-CloudTrail"],
+    "SNS": ["SNS", "Simple-Notification-Service", "Amazon-Simple-Notification-Service"],
+    "SQS": ["SQS", "Simple-Queue-Service", "Amazon-Simple-Queue-Service"],
+    "IAM": ["IAM", "Identity-and-Access-Management", "AWS-Identity-and-Access-Management"],
+    "KMS": ["KMS", "Key-Management-Service", "AWS-Key-Management-Service"],
+    "ECS": ["ECS", "Elastic-Container-Service", "Amazon-Elastic-Container-Service"],
+    "EKS": ["EKS", "Elastic-Kubernetes-Service", "Amazon-Elastic-Kubernetes-Service"],
+    "ECR": ["ECR", "Elastic-Container-Registry", "Amazon-Elastic-Container-Registry"],
+    "ElastiCache": ["ElastiCache", "Amazon-ElastiCache"],
+    "ElasticLoadBalancing": ["Elastic-Load-Balancing", "ELB"],
+    "ElasticLoadBalancingV2": ["Elastic-Load-Balancing", "ELB"],
+    "AutoScaling": ["Auto-Scaling", "EC2-Auto-Scaling", "Amazon-EC2-Auto-Scaling"],
+    "ApiGateway": ["API-Gateway", "Amazon-API-Gateway"],
+    "ApiGatewayV2": ["API-Gateway", "Amazon-API-Gateway"],
+    "Cognito": ["Cognito", "Amazon-Cognito"],
+    "SecretsManager": ["Secrets-Manager", "AWS-Secrets-Manager"],
+    "EventBridge": ["EventBridge", "Amazon-EventBridge"],
+    "Events": ["EventBridge", "Amazon-EventBridge"],
+    "StepFunctions": ["Step-Functions", "AWS-Step-Functions"],
+    "Glue": ["Glue", "AWS-Glue"],
+    "SageMaker": ["SageMaker", "Amazon-SageMaker", "Amazon-SageMaker-AI"],
+    "CodePipeline": ["CodePipeline", "AWS-CodePipeline"],
+    "CodeBuild": ["CodeBuild", "AWS-CodeBuild"],
+    "CodeCommit": ["CodeCommit", "AWS-CodeCommit"],
+    "CodeDeploy": ["CodeDeploy", "AWS-CodeDeploy"],
+    "Kinesis": ["Kinesis", "Amazon-Kinesis"],
+    "KinesisFirehose": ["Kinesis", "Data-Firehose", "Amazon-Data-Firehose"],
+    "KinesisAnalytics": ["Kinesis", "Managed-Service-for-Apache-Flink"],
+    "Athena": ["Athena", "Amazon-Athena"],
+    "Redshift": ["Redshift", "Amazon-Redshift"],
+    "EFS": ["EFS", "Elastic-File-System", "Amazon-Elastic-File-System"],
+    "Backup": ["Backup", "AWS-Backup"],
+    "WAF": ["WAF", "AWS-WAF"],
+    "WAFv2": ["WAF", "AWS-WAF"],
+    "Config": ["Config", "AWS-Config"],
+    "SSM": ["Systems-Manager", "AWS-Systems-Manager"],
+    "AppSync": ["AppSync", "AWS-AppSync"],
+    "Amplify": ["Amplify", "AWS-Amplify"],
+    "ElasticBeanstalk": ["Elastic-Beanstalk", "AWS-Elastic-Beanstalk"],
+    "OpenSearchService": ["OpenSearch-Service", "Amazon-OpenSearch-Service"],
+    "IoT": ["IoT", "AWS-IoT", "AWS-IoT-Core"],
+    "MSK": ["MSK", "Managed-Streaming-for-Apache-Kafka", "Amazon-Managed-Streaming-for-Apache-Kafka"],
+    "DocDB": ["DocumentDB", "Amazon-DocumentDB"],
+    "Neptune": ["Neptune", "Amazon-Neptune"],
+    "QLDB": ["QLDB", "Quantum-Ledger-Database", "Amazon-Quantum-Ledger-Database"],
+    "Timestream": ["Timestream", "Amazon-Timestream"],
+    "Route53": ["Route-53", "Amazon-Route-53"],
+    "CloudFront": ["CloudFront", "Amazon-CloudFront"],
+    "ACM": ["Certificate-Manager", "AWS-Certificate-Manager"],
+    "AppFlow": ["AppFlow", "Amazon-AppFlow"],
+    "AppConfig": ["AppConfig", "AWS-AppConfig"],
+    "Batch": ["Batch", "AWS-Batch"],
+    "DataSync": ["DataSync", "AWS-DataSync"],
+    "DMS": ["Database-Migration-Service", "AWS-Database-Migration-Service"],
+    "EMR": ["EMR", "Amazon-EMR"],
+    "FSx": ["FSx", "Amazon-FSx"],
+    "GameLift": ["GameLift", "Amazon-GameLift"],
+    "Macie": ["Macie", "Amazon-Macie"],
+    "MQ": ["MQ", "Amazon-MQ"],
+    "QuickSight": ["QuickSight", "Amazon-QuickSight"],
+    "WorkSpaces": ["WorkSpaces", "Amazon-WorkSpaces"],
+    "LakeFormation": ["Lake-Formation", "AWS-Lake-Formation"],
+    "DataExchange": ["Data-Exchange", "AWS-Data-Exchange"],
+    "FinSpace": ["FinSpace", "Amazon-FinSpace"],
+    "Forecast": ["Forecast", "Amazon-Forecast"],
+    "Comprehend": ["Comprehend", "Amazon-Comprehend"],
+    "Translate": ["Translate", "Amazon-Translate"],
+    "Transcribe": ["Transcribe", "Amazon-Transcribe"],
+    "Rekognition": ["Rekognition", "Amazon-Rekognition"],
+    "Textract": ["Textract", "Amazon-Textract"],
+    "Polly": ["Polly", "Amazon-Polly"],
+    "Lex": ["Lex", "Amazon-Lex"],
+    "Connect": ["Connect", "Amazon-Connect"],
+    "Pinpoint": ["Pinpoint", "Amazon-Pinpoint"],
+    "SES": ["SES", "Simple-Email-Service", "Amazon-Simple-Email-Service"],
+    "Chime": ["Chime", "Amazon-Chime"],
+    "WorkMail": ["WorkMail", "Amazon-WorkMail"],
+    "Shield": ["Shield", "AWS-Shield"],
+    "GuardDuty": ["GuardDuty", "Amazon-GuardDuty"],
+    "Inspector": ["Inspector", "Amazon-Inspector"],
+    "SecurityHub": ["Security-Hub", "AWS-Security-Hub"],
+    "Artifact": ["Artifact", "AWS-Artifact"],
+    "Audit": ["Audit-Manager", "AWS-Audit-Manager"],
+    "ControlTower": ["Control-Tower", "AWS-Control-Tower"],
+    "Organizations": ["Organizations", "AWS-Organizations"],
+    "ResourceGroups": ["Resource-Groups", "AWS-Resource-Groups"],
+    "ServiceCatalog": ["Service-Catalog", "AWS-Service-Catalog"],
+    "CloudMap": ["Cloud-Map", "AWS-Cloud-Map"],
+    "AppMesh": ["App-Mesh", "AWS-App-Mesh"],
+    "XRay": ["X-Ray", "AWS-X-Ray"],
+    "DevOpsGuru": ["DevOps-Guru", "Amazon-DevOps-Guru"],
+}
+
+# Lower-to-upper case boundary, hyphenated to match icon names (e.g. StepFunctions -> Step-Functions)
+CAMEL_CASE_BOUNDARY = re.compile(r'([a-z])([A-Z])')
+
+@lru_cache(maxsize=None)
+def normalize_service_name(service: str) -> Tuple[str, ...]:
+    """Generate possible icon name variations for a service, most likely first."""
     # Remove AWS:: prefix if present
-    if service.startswith("AWS::"):
-        service = service[5:]
-    
-    # Check if we have specific mappings
-    if service in service_mappings:
-        variations.extend(service_mappings[service])
-    
-    # Generate hyphenated version
-    hyphenated = re.sub(r'([a-z])([A-Z])', r'\1-\2', service)
-    variations.append(hyphenated)
+    name = service[5:] if service.startswith("AWS::") else service
     
-    # Add AWS- and Amazon- prefixes
-    for var in list(variations):
-        variations.append(f"AWS-{var}")
-        variations.append(f"Amazon-{var}")
+    # Original name, specific mappings, then the hyphenated version
+    base_names = [service, *SERVICE_MAPPINGS.get(name, ()), CAMEL_CASE_BOUNDARY.sub(r'\1-\2', name)]
     
-    return list(set(variations))
+    # Each followed by its AWS- and Amazon- prefixed forms; dict.fromkeys drops duplicates but keeps this order
+    return tuple(dict.fromkeys(
+        base_names + [prefixed for var in base_names for prefixed in (f"AWS-{var}", f"Amazon-{var}")]
+    ))
+
+class IconIndex(NamedTuple):
+    """In-memory listing of the icon tree, one entry per icon set directory in sorted order."""
+    arch_service: List[Dict[Tuple[str, str], str]]  # (size, service name) -> path
+    resource: List[List[Tuple[str, str]]]  # (name, path) of the 48px entries below the set
+    arch_group: List[List[Tuple[str, str]]]  # (name, path) of the set's top-level 32px entries
+
+# Architecture service icon name forms, most preferred first
+ARCH_ICON_NAME_FORMS = [("Arch_", ".png"), ("Arch_", ".svg"), ("Arch-", ".png"), ("Arch-", ".svg")]
+
+def project_path(path: str) -> str:
+    """Convert a path under ICONS_BASE_DIR to the project-relative POSIX form used in the Rust file."""
+    return path.replace(os.sep, "/")
+
+def scan_dir(path: str) -> List[Tuple[str, str]]:
+    """List (name, path) of the entries directly inside a directory."""
+    with os.scandir(path) as entries:
+        return [(entry.name, project_path(entry.path)) for entry in entries]
+
+def scan_tree(path: str) -> List[Tuple[str, str]]:
+    """Recursively list (name, path) of every entry below a directory."""
+    found = []
+    with os.scandir(path) as entries:
+        for entry in entries:
+            found.append((entry.name, project_path(entry.path)))
+            if entry.is_dir(follow_symlinks=False):
+                found.extend(scan_tree(entry.path))
+    return found
+
+def index_arch_service_icons(arch_dir: str) -> Dict[Tuple[str, str], str]:
+    """Index an Architecture-Service-Icons set by (size, service name)."""
+    # Architecture service icons live in <category>/<size>/Arch_<service>_<size>.<ext>
+    by_size_and_service = {}
+    with os.scandir(arch_dir) as categories:
+        for category_dir in categories:
+            if not category_dir.is_dir():
+                continue
+            with os.scandir(category_dir.path) as entries:
+                size_dirs = {entry.name: entry.path for entry in entries if entry.is_dir()}
+            for size in ICON_SIZE_PREFERENCE:
+                if size not in size_dirs:
+                    continue
+                for name, icon_path in scan_dir(size_dirs[size]):
+                    for rank, (prefix, suffix) in enumerate(ARCH_ICON_NAME_FORMS):
+                        size_suffix = f"_{size}{suffix}"
+                        if name.startswith(prefix) and name.endswith(size_suffix):
+                            service_var = name[len(prefix):-len(size_suffix)]
+                            key = (size, service_var)
+                            # Keep the preferred name form, then the first category found
+                            if key not in by_size_and_service or rank < by_size_and_service[key][0]:
+                                by_size_and_service[key] = (rank, icon_path)
+                            break
+    return {key: icon_path for key, (_, icon_path) in by_size_and_service.items()}
+
+def index_resource_icons(res_dir: str) -> List[Tuple[str, str]]:
+    """List the icons of a Resource-Icons set, preferring 48px."""
+    return [(name, icon_path) for name, icon_path in scan_tree(res_dir) if RESOURCE_ICON_SIZE_PATTERN.search(icon_path)]
+
+def index_group_icons(group_dir: str) -> List[Tuple[str, str]]:
+    """List the icons of an Architecture-Group-Icons set, preferring 32px."""
+    return [(name, icon_path) for name, icon_path in scan_dir(group_dir) if GROUP_ICON_SIZE_PATTERN.search(icon_path)]
 
-def find_icon_for_resource(resource_type: str, icons_base: Path) -> Optional[str]:
+def build_icon_index(icons_base: Path) -> IconIndex:
+    """Walk the icon tree once so icon lookups need no further filesystem access."""
+    if not icons_base.is_dir():
+        return IconIndex([], [], [])
+    
+    # List the icon set directories once
+    with os.scandir(icons_base) as entries:
+        icon_sets = sorted((entry.name, entry.path) for entry in entries)
+    
+    def icon_set_dirs(pattern: str) -> List[str]:
+        return [set_path for set_name, set_path in icon_sets if fnmatchcase(set_name, pattern)]
+    
+    # Icon lookups are in-memory; the directory walk is the only IO, so overlap it across icon sets
+    with ThreadPoolExecutor(ICON_SCAN_WORKERS) as executor:
+        arch_service = executor.map(index_arch_service_icons, icon_set_dirs(ARCH_SERVICE_ICONS_PATTERN))
+        resource = executor.map(index_resource_icons, icon_set_dirs(RESOURCE_ICONS_PATTERN))
+        arch_group = executor.map(index_group_icons, icon_set_dirs(ARCH_GROUP_ICONS_PATTERN))
+        return IconIndex(list(arch_service), list(resource), list(arch_group))
+
+def icon_tree_fingerprint(icons_base: Path) -> list:
+    """Identify the icon tree by its location and the names and mtimes of its icon set directories.
+
+    Icon packs are replaced as whole dated directories (e.g. Resource-Icons_02072025), which
+    changes this fingerprint without walking the individual icons.
+    """
+    with os.scandir(icons_base) as entries:
+        icon_sets = sorted([entry.name, entry.stat().st_mtime_ns] for entry in entries)
+    return [ICON_INDEX_CACHE_VERSION, str(icons_base.resolve()), icon_sets]
+
+def load_icon_index(icons_base: Path) -> IconIndex:
+    """Load the icon index from the cache if the icon tree is unchanged, otherwise build and cache it."""
+    if not icons_base.is_dir():
+        return build_icon_index(icons_base)
+    
+    fingerprint = icon_tree_fingerprint(icons_base)
+    try:
+        cached = json_loads(ICON_INDEX_CACHE_FILE.read_bytes())
+        if cached["fingerprint"] == fingerprint:
+            print(f"Using cached icon index from {ICON_INDEX_CACHE_FILE}")
+            return IconIndex(
+                [{tuple(key.split("|", 1)): icon_path for key, icon_path in icons.items()} for icons in cached["arch_service"]],
+                [[tuple(icon) for icon in icons] for icons in cached["resource"]],
+                [[tuple(icon) for icon in icons] for icons in cached["arch_group"]],
+            )
+    except (OSError, ValueError, KeyError):
+        pass  # No usable cache; rebuild below
+    
+    icon_index = build_icon_index(icons_base)
+    
+    # JSON object keys must be strings, so (size, service name) keys are stored as "size|service"
+    ICON_INDEX_CACHE_FILE.parent.mkdir(parents=True, exist_ok=True)
+    ICON_INDEX_CACHE_FILE.write_text(json.dumps({
+        "fingerprint": fingerprint,
+        "arch_service": [{f"{size}|{service_var}": icon_path for (size, service_var), icon_path in icons.items()}
+                         for icons in icon_index.arch_service],
+        "resource": icon_index.resource,
+        "arch_group": icon_index.arch_group,
+    }))
+    print(f"Cached icon index to {ICON_INDEX_CACHE_FILE}")
+    
+    return icon_index
+
+def first_matching_icon(icons: List[Tuple[str, str]], service_var: str,
+                        patterns: List[Tuple[str, str]]) -> Optional[str]:
+    """Return the first icon named like *<service_var>*<part>*<suffix>, trying (part, suffix) patterns in order."""
+    candidates = [(name, icon_path) for name, icon_path in icons if service_var in name]
+    for part, suffix in patterns:
+        for name, icon_path in candidates:
+            if name.endswith(suffix):
+                stem = name[:-len(suffix)]
+                start = stem.find(service_var)
+                if start != -1 and part in stem[start + len(service_var):]:
+                    return icon_path
+    return None
+
+def find_icon_for_resource(resource_type: str, icon_index: IconIndex) -> Optional[str]:
     """Find the best matching icon for a CloudFormation resource type."""
     # Parse resource type
     parts = resource_type.split("::")
@@ -224,87 +361,44 @@ def find_icon_for_resource(resource_type: str, icons_base: Path) -> Optional[str
     # Generate service name variations
     service_variations = normalize_service_name(service)
     
-    # Helper function to get relative path
-    def get_relative_path(icon_file: Path) -> str:
-        """Get relative path from project root."""
-        # Convert to absolute paths for comparison
-        icon_abs = icon_file.resolve()
-        cwd_abs = Path.cwd().resolve()
-        icons_base_abs = icons_base.resolve()
-        
-        # If icon is under current directory
-        try:
-            return str(icon_abs.relative_to(cwd_abs))
-        except ValueError:
-            # Otherwise construct path from icons base
-            try:
-                rel_from_icons = icon_abs.relative_to(icons_base_abs.parent.parent)
-                return str(rel_from_icons)
-            except ValueError:
-                # Last resort: return the original path
-                return str(icon_file)
-    
     # Search order:
     # 1. Architecture-Service-Icons (preferred)
     # 2. Resource-Icons
     # 3. Architecture-Group-Icons
     
     # First, try Architecture-Service-Icons
-    for arch_dir in sorted(icons_base.glob(ARCH_SERVICE_ICONS_PATTERN)):
+    for arch_icons in icon_index.arch_service:
         for size in ICON_SIZE_PREFERENCE:
             for service_var in service_variations:
-                # Try different naming patterns
-                patterns = [
-                    f"Arch_{service_var}_{size}.png",
-                    f"Arch_{service_var}_{size}.svg",
-                    f"Arch-{service_var}_{size}.png",
-                    f"Arch-{service_var}_{size}.svg",
-                ]
-                
-                for pattern in patterns:
-                    # Search in category subdirectories
-                    for category_dir in arch_dir.iterdir():
-                        if category_dir.is_dir():
-                            size_dir = category_dir / size
-                            if size_dir.exists():
-                                for icon_file in size_dir.glob(pattern):
-                                    if icon_file.exists():
-                                        return get_relative_path(icon_file)
+                icon_path = arch_icons.get((size, service_var))
+                if icon_path:
+                    return icon_path
     
     # Second, try Resource-Icons with more specific matching
-    for res_dir in sorted(icons_base.glob(RESOURCE_ICONS_PATTERN)):
+    for res_icons in icon_index.resource:
         for service_var in service_variations:
             # Try to match based on resource type too
-            resource_patterns = [
-                f"*{service_var}*{resource}*.png",
-                f"*{service_var}*{resource}*.svg",
-                f"*{service_var}*.png",
-                f"*{service_var}*.svg",
-            ]
-            
-            for pattern in resource_patterns:
-                for icon_file in res_dir.rglob(pattern):
-                    if icon_file.exists() and "48" in str(icon_file):  # Prefer 48px for resource icons
-                        return get_relative_path(icon_file)
+            icon_path = first_matching_icon(res_icons, service_var, [
+                (resource, ".png"),
+                (resource, ".svg"),
+                ("", ".png"),
+                ("", ".svg"),
+            ])
+            if icon_path:
+                return icon_path
     
     # Third, try Architecture-Group-Icons
-    for group_dir in sorted(icons_base.glob(ARCH_GROUP_ICONS_PATTERN)):
+    for group_icons in icon_index.arch_group:
         for service_var in service_variations:
-            patterns = [
-                f"*{service_var}*.png",
-                f"*{service_var}*.svg",
-            ]
-            
-            for pattern in patterns:
-                for icon_file in group_dir.glob(pattern):
-                    if icon_file.exists() and "32" in str(icon_file):  # Prefer 32px for group icons
-                        return get_relative_path(icon_file)
+            icon_path = first_matching_icon(group_icons, service_var, [("", ".png"), ("", ".svg")])
+            if icon_path:
+                return icon_path
     
     return None
 
 def generate_rust_file(resource_icon_map: Dict[str, str], output_file: Path):
     """Generate the Rust source file with resource-to-icon mappings."""
-    rust_content = '''use std::collections::HashMap;
+    rust_parts = ['''use std::collections::HashMap;
 use once_cell::sync::Lazy;
 use tracing::{debug, warn};
 
@@ -313,32 +407,49 @@ use tracing::{debug, warn};
 pub static RESOURCE_ICONS: Lazy<HashMap<&'static str, &'static str>> = Lazy::new(|| {
     let mut map = HashMap::new();
     
-'''
+''']
     
     # Group resources by service for better organization
-    service_groups = defaultdict(list)
-    for resource_type, icon_path in sorted(resource_icon_map.items()):
+    def service_of(resource_type: str) -> str:
         parts = resource_type.split("::")
-        if len(parts) >= 2:
-            service = parts[1]
-            service_groups[service].append((resource_type, icon_path))
-        else:
-            service_groups["Other"].append((resource_type, icon_path))
+        return parts[1] if len(parts) >= 2 else "Other"
+    
+    entries = sorted(resource_icon_map.items(), key=lambda item: (service_of(item[0]), item[0]))
     
     # Write entries grouped by service
-    for service in sorted(service_groups.keys()):
-        rust_content += f"    // {service} Resources\n"
-        for resource_type, icon_path in service_groups[service]:
-            rust_content += f'    map.insert("{resource_type}", "{icon_path}");\n'
-        rust_content += "\n"
+    for service, service_entries in groupby(entries, key=lambda item: service_of(item[0])):
+        rust_parts.append(f"    // {service} Resources\n")
+        for resource_type, icon_path in service_entries:
+            rust_parts.append(f'    map.insert("{resource_type}", "{icon_path}");\n')
+        rust_parts.append("\n")
     
     # Add default icon
-    rust_content += '''    // Default icon for unknown resource types
+    rust_parts.append('''    // Default icon for unknown resource types
     map.insert("default", "assets/Icons/Architecture-Group-Icons_02072025/AWS-Cloud_32.png");
     
     map
 });
 
+/// Map of service prefixes (e.g. "AWS::EC2") to the icon of the service's first mapped resource type,
+/// used when a resource type has no exact entry
+pub static SERVICE_FALLBACK_ICONS: Lazy<HashMap<&'static str, &'static str>> = Lazy::new(|| {
+    let mut map = HashMap::new();
+    
+''')
+    
+    service_fallback_icons = {}
+    for resource_type, icon_path in entries:
+        parts = resource_type.split("::")
+        if len(parts) >= 2:
+            service_fallback_icons.setdefault("::".join(parts[:2]), icon_path)
+    
+    for service_prefix in sorted(service_fallback_icons):
+        rust_parts.append(f'    map.insert("{service_prefix}", "{service_fallback_icons[service_prefix]}");\n')
+    
+    rust_parts.append('''    
+    map
+});
+
 /// Get the icon path for a given CloudFormation resource type
 pub fn get_icon_for_resource(resource_type: &str) -> &'static str {
     if let Some(icon_path) = RESOURCE_ICONS.get(resource_type) {
@@ -350,12 +461,9 @@ pub fn get_icon_for_resource(resource_type: &str) -> &'static str {
     let service_prefix = resource_type.split("::").take(2).collect::<Vec<_>>().join("::");
     debug!("No exact match for {}, trying service prefix: {}", resource_type, service_prefix);
     
-    // Check if we have any resources that start with this service prefix
-    for (key, value) in RESOURCE_ICONS.iter() {
-        if key.starts_with(&service_prefix) && *key != "default" {
-            debug!("Found service prefix match: {} -> {}", key, value);
-            return value;
-        }
+    if let Some(icon_path) = SERVICE_FALLBACK_ICONS.get(service_prefix.as_str()) {
+        debug!("Found service prefix match: {} -> {}", service_prefix, icon_path);
+        return icon_path;
     }
     
     // Return default icon if no match found
@@ -363,11 +471,13 @@ pub fn get_icon_for_resource(resource_type: &str) -> &'static str {
     warn!("No icon found for resource type: {}, using default: {}", resource_type, default_icon);
     default_icon
 }
-'''
+''')
     
+    # Write to a temporary file and rename it over the output, so a failed run never leaves a truncated file
     output_file.parent.mkdir(parents=True, exist_ok=True)
-    with open(output_file, 'w') as f:
-        f.write(rust_content)
+    tmp_file = output_file.with_suffix('.rs.tmp')
+    tmp_file.write_bytes("".join(rust_parts).encode('utf-8'))
+    os.replace(tmp_file, output_file)
     
     print(f"Generated {output_file} with {len(resource_icon_map)} resource mappings")
 
@@ -380,12 +490,15 @@ def main():
     resource_types = get_all_resource_types(spec)
     print(f"Found {len(resource_types)} CloudFormation resource types")
     
+    # Index the icon tree once (or reuse the cached index); every lookup below is then in memory
+    icon_index = load_icon_index(ICONS_BASE_DIR)
+    
     # Find icons for each resource
     resource_icon_map = {}
     icons_found = 0
     
     for resource_type in resource_types:
-        icon_path = find_icon_for_resource(resource_type, ICONS_BASE_DIR)
+        icon_path = find_icon_for_resource(resource_type, icon_index)
         if icon_path:
             resource_icon_map[resource_type] = icon_path
             icons_found += 1
@@ -6,9 +6,63 @@ This script automates the migration of normalizers from sync ResourceNormalizer
 to async AsyncResourceNormalizer with tag fetching support.
 """
 
+import io
 import re
 import sys
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
 from pathlib import Path
+from typing import Tuple
+
+# Pattern: impl ResourceNormalizer for XxxNormalizer {
+IMPL_PATTERN = re.compile(r'impl ResourceNormalizer for (\w+Normalizer) \{')
+
+# Look for: fn normalize(\n        &self,\n        raw_response: serde_json::Value,
+NORMALIZE_PATTERN = re.compile(
+    r'fn normalize\(\s*'
+    r'&self,\s*'
+    r'raw_response: serde_json::Value,\s*'
+    r'account: &str,\s*'
+    r'region: &str,\s*'
+    r'query_timestamp: DateTime<Utc>,\s*'
+    r'\) -> Result<ResourceEntry> \{',
+    re.MULTILINE
+)
+NORMALIZE_SIGNATURE_PATTERN = re.compile(
+    r'fn normalize\(\s*&self,\s*raw_response: serde_json::Value,\s*account: &str,\s*region: &str,\s*query_timestamp: DateTime<Utc>,\s*\)'
+)
+TAGS_PATTERN = re.compile(r'(\s+)let tags = extract_tags\(&raw_response\);')
+RESOURCE_ID_PATTERN = re.compile(r'let (\w+) = raw_response')
+RESOURCE_TYPE_PATTERN = re.compile(r'fn resource_type\(&self\) -> &\'static str \{\s*"([^"]+)"')
+
+
+def apply_edits(content: str, edits: list) -> str:
+    """Apply non-overlapping (start, end, replacement) edits in a single pass."""
+    parts = []
+    last = 0
+    for start, end, replacement in sorted(edits):
+        parts.append(content[last:start])
+        parts.append(replacement)
+        last = end
+    parts.append(content[last:])
+    return ''.join(parts)
+
+
+def find_block_end(content: str, open_pos: int) -> int:
+    """Return the index just past the brace closing the block opened at open_pos, or -1."""
+    depth = 0
+    next_open = content.find('{', open_pos)
+    next_close = content.find('}', open_pos)
+    while next_close != -1:
+        if next_open != -1 and next_open < next_close:
+            depth += 1
+            next_open = content.find('{', next_open + 1)
+        else:
+            depth -= 1
+            if depth == 0:
+                return next_close + 1
+            next_close = content.find('}', next_close + 1)
+    return -1
 
 
 def migrate_normalizer_file(file_path: Path) -> bool:
@@ -16,26 +70,30 @@ def migrate_normalizer_file(file_path: Path) -> bool:
     print(f"Processing: {file_path}")
 
     content = file_path.read_text()
-    original_content = content
+
+    # Edits are collected against the original content and applied in one pass
+    edits = []
 
     # Step 1: Add async_trait import if not present
     if 'use async_trait::async_trait;' not in content:
         # Find the imports section and add async_trait
         if 'use anyhow::Result;' in content:
-            content = content.replace(
-                'use anyhow::Result;',
-                'use anyhow::Result;\nuse async_trait::async_trait;'
-            )
+            import_line = 'use anyhow::Result;'
+            import_replacement = 'use anyhow::Result;\nuse async_trait::async_trait;'
         elif 'use chrono::{DateTime, Utc};' in content:
-            content = content.replace(
-                'use chrono::{DateTime, Utc};',
-                'use async_trait::async_trait;\nuse chrono::{DateTime, Utc};'
-            )
+            import_line = 'use chrono::{DateTime, Utc};'
+            import_replacement = 'use async_trait::async_trait;\nuse chrono::{DateTime, Utc};'
+        else:
+            import_line = None
+
+        if import_line:
+            pos = content.find(import_line)
+            while pos != -1:
+                edits.append((pos, pos + len(import_line), import_replacement))
+                pos = content.find(import_line, pos + len(import_line))
 
     # Step 2: Find all ResourceNormalizer implementations
-    # Pattern: impl ResourceNormalizer for XxxNormalizer {
-    pattern = r'impl ResourceNormalizer for (\w+Normalizer) \{'
-    matches = list(re.finditer(pattern, content))
+    matches = list(IMPL_PATTERN.finditer(content))
 
     if not matches:
         print(f"  No ResourceNormalizer implementations found")
@@ -43,34 +101,21 @@ def migrate_normalizer_file(file_path: Path) -> bool:
 
     print(f"  Found {len(matches)} normalizer(s) to migrate")
 
-    # Process each normalizer from bottom to top (to preserve positions)
+    # Report from bottom to top, matching the order the edits used to be spliced in
     for match in reversed(matches):
         normalizer_name = match.group(1)
         start_pos = match.start()
 
-        # Find the normalize() method
-        # Look for: fn normalize(\n        &self,\n        raw_response: serde_json::Value,
-        normalize_pattern = (
-            r'fn normalize\(\s*'
-            r'&self,\s*'
-            r'raw_response: serde_json::Value,\s*'
-            r'account: &str,\s*'
-            r'region: &str,\s*'
-            r'query_timestamp: DateTime<Utc>,\s*'
-            r'\) -> Result<ResourceEntry> \{'
-        )
-
         # Search for normalize method after the impl start
         impl_section = content[start_pos:start_pos + 5000]  # Look ahead up to 5000 chars
-        normalize_match = re.search(normalize_pattern, impl_section, re.MULTILINE)
+        normalize_match = NORMALIZE_PATTERN.search(impl_section)
 
         if not normalize_match:
             print(f"  WARNING: Could not find normalize() method for {normalizer_name}")
             continue
 
         # Find the line with `let tags = extract_tags(&raw_response);`
-        tags_pattern = r'(\s+)let tags = extract_tags\(&raw_response\);'
-        tags_match = re.search(tags_pattern, impl_section)
+        tags_match = TAGS_PATTERN.search(impl_section)
 
         if not tags_match:
             print(f"  WARNING: Could not find tags extraction for {normalizer_name}")
@@ -81,17 +126,15 @@ def migrate_normalizer_file(file_path: Path) -> bool:
         tags_line_end = start_pos + tags_match.end()
 
         # Extract resource_id variable name (look backwards from tags line)
-        resource_id_pattern = r'let (\w+) = raw_response'
-        id_matches = list(re.finditer(resource_id_pattern, content[start_pos:tags_line_start]))
-        if not id_matches:
+        id_match = RESOURCE_ID_PATTERN.search(content, start_pos, tags_line_start)
+        if not id_match:
             print(f"  WARNING: Could not find resource_id variable for {normalizer_name}")
             continue
 
-        resource_id_var = id_matches[0].group(1)  # Use first match (usually the main ID)
+        resource_id_var = id_match.group(1)  # Use first match (usually the main ID)
 
         # Get resource type from resource_type() method
-        resource_type_pattern = r'fn resource_type\(&self\) -> &\'static str \{\s*"([^"]+)"'
-        type_match = re.search(resource_type_pattern, impl_section)
+        type_match = RESOURCE_TYPE_PATTERN.search(impl_section)
         if not type_match:
             print(f"  WARNING: Could not find resource_type for {normalizer_name}")
             continue
@@ -108,54 +151,23 @@ def migrate_normalizer_file(file_path: Path) -> bool:
 {indent}        Vec::new()
 {indent}    }});'''
 
-        # Replace the extract_tags line
-        content = content[:tags_line_start] + async_tags_code + content[tags_line_end:]
-
-        # Now add async trait implementation BEFORE the sync impl
-        async_impl_code = f'''#[async_trait]
-impl AsyncResourceNormalizer for {normalizer_name} {{
-    async fn normalize(
-        &self,
-        raw_response: serde_json::Value,
-        account: &str,
-        region: &str,
-        query_timestamp: DateTime<Utc>,
-        aws_client: &AWSResourceClient,
-    ) -> Result<ResourceEntry> {{'''
-
-        # Find where to insert (right before "impl ResourceNormalizer")
-        impl_insertion_point = content.find(f'impl ResourceNormalizer for {normalizer_name}')
-        if impl_insertion_point == -1:
-            print(f"  ERROR: Lost track of impl for {normalizer_name}")
-            continue
-
-        # Adjust for changes made so far
-        updated_impl_section = content[impl_insertion_point:impl_insertion_point + 5000]
-
         # Extract the entire implementation (find matching closing brace)
-        brace_count = 0
-        impl_end = impl_insertion_point
-        found_start = False
-
-        for i, char in enumerate(content[impl_insertion_point:]):
-            if char == '{':
-                brace_count += 1
-                found_start = True
-            elif char == '}':
-                brace_count -= 1
-                if found_start and brace_count == 0:
-                    impl_end = impl_insertion_point + i + 1
-                    break
-
-        if impl_end == impl_insertion_point:
+        impl_end = find_block_end(content, match.end() - 1)
+
+        if impl_end == -1:
             print(f"  ERROR: Could not find end of impl for {normalizer_name}")
             continue
 
-        # Get the original implementation
-        original_impl = content[impl_insertion_point:impl_end]
+        if tags_line_end > impl_end:
+            print(f"  WARNING: Could not find tags extraction for {normalizer_name}")
+            continue
 
-        # Create async version by modifying the original
-        async_impl = original_impl
+        # Get the original implementation, split around the tags line
+        before_tags = content[start_pos:tags_line_start]
+        after_tags = content[tags_line_end:impl_end]
+
+        # Create async version with the async tag fetching
+        async_impl = before_tags + async_tags_code + after_tags
 
         # Change impl declaration to async
         async_impl = async_impl.replace(
@@ -165,12 +177,14 @@ impl AsyncResourceNormalizer for {normalizer_name} {{
         )
 
         # Change fn signature to async
-        async_impl = re.sub(
-            r'fn normalize\(\s*&self,\s*raw_response: serde_json::Value,\s*account: &str,\s*region: &str,\s*query_timestamp: DateTime<Utc>,\s*\)',
+        async_impl = NORMALIZE_SIGNATURE_PATTERN.sub(
             'async fn normalize(\n        &self,\n        raw_response: serde_json::Value,\n        account: &str,\n        region: &str,\n        query_timestamp: DateTime<Utc>,\n        aws_client: &AWSResourceClient,\n    )',
             async_impl
         )
 
+        # Keep the sync impl, with local tag extraction, for compatibility during migration
+        sync_impl = f'{before_tags}{indent}let tags = extract_tags(&raw_response); // Fallback to local extraction for sync path{after_tags}'
+
         # Add comment to original impl
         sync_impl_comment = f'''// Temporary: Keep old sync implementation for compatibility during migration
 // This will be removed once all normalizers are migrated and query_resources is updated
@@ -178,15 +192,14 @@ impl AsyncResourceNormalizer for {normalizer_name} {{
 '''
 
         # Replace old impl with async impl + commented sync impl
-        modified_impl = f'''{async_impl}
+        edits.append((start_pos, impl_end, f'''{async_impl}
 
-{sync_impl_comment}{original_impl.replace(async_tags_code, f'{indent}let tags = extract_tags(&raw_response); // Fallback to local extraction for sync path')}'''
-
-        content = content[:impl_insertion_point] + modified_impl + content[impl_end:]
+{sync_impl_comment}{sync_impl}'''))
 
     # Only write if changes were made
-    if content != original_content:
-        file_path.write_text(content)
+    new_content = apply_edits(content, edits)
+    if new_content != content:
+        file_path.write_text(new_content)
         print(f"  ✓ Migrated {len(matches)} normalizer(s)")
         return True
     else:
@@ -194,20 +207,35 @@ impl AsyncResourceNormalizer for {normalizer_name} {{
         return False
 
 
+def migrate_file_capturing_output(file_path: Path) -> Tuple[bool, str]:
+    """Migrate a file in a worker process, returning its log instead of interleaving it."""
+    output = io.StringIO()
+    with redirect_stdout(output):
+        migrated = migrate_normalizer_file(file_path)
+    return migrated, output.getvalue()
+
+
 def main():
     if len(sys.argv) < 2:
         print("Usage: migrate_normalizers.py <file1.rs> [file2.rs ...]")
         sys.exit(1)
 
-    files_to_process = [Path(f) for f in sys.argv[1:]]
+    # Files are independent, so migrate them in parallel and report in argument order
+    files_to_process = list(dict.fromkeys(Path(f) for f in sys.argv[1:]))
+    existing_files = [file_path for file_path in files_to_process if file_path.exists()]
+
+    with ProcessPoolExecutor() as executor:
+        results = dict(zip(existing_files, executor.map(migrate_file_capturing_output, existing_files)))
 
     migrated_count = 0
     for file_path in files_to_process:
-        if not file_path.exists():
+        if file_path not in results:
             print(f"ERROR: File not found: {file_path}")
             continue
 
-        if migrate_normalizer_file(file_path):
+        migrated, output = results[file_path]
+        print(output, end='')
+        if migrated:
             migrated_count += 1
 
     print(f"\n✓ Successfully migrated {migrated_count} file(s)")
@@ -2,183 +2,303 @@
 """Generate a complete structural map of a Rust source file.
 
 Usage:
-    python3 scripts/source-map.py <rust_file_path>
+    python3 scripts/source-map.py <rust_file_path> [<rust_file_path> ...]
 
 Example:
     python3 scripts/source-map.py src/app/dashui/keyboard_navigation.rs
+    python3 scripts/source-map.py src/app/dashui/*.rs
+
+Maps are cached in ~/.cache/source-map/ and reused until the Rust file (or this script) changes.
 """
 
+import hashlib
+import mmap
+import os
 import re
 import sys
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+# Cache of generated maps, keyed by source path, mtime and size; least recently used entries are evicted
+CACHE_DIR = Path.home() / '.cache' / 'source-map'
+CACHE_MAX_ENTRIES = 200
+
+# Top-level items, matched as bytes against the mapped file; enums and structs include
+# their leading doc comments (and enum attributes). Enum bodies can nest braces (struct
+# variants), so ENUM_RE only matches up to the opening brace and the body is found by block_end().
+# Identifiers may be non-ASCII, so every UTF-8 byte (\x80-\xff) counts as an identifier
+# character alongside the ASCII \w that bytes patterns match.
+ENUM_RE = re.compile(rb'(?:///[^\n]*\n)*(?:#\[[^\]]*\]\n)*pub enum ([\w\x80-\xff]+)[^{]*\{', re.MULTILINE)
+STRUCT_RE = re.compile(rb'(?:///[^\n]*\n)*pub struct ([\w\x80-\xff]+)[^{]*\{([^}]*)\}', re.MULTILINE)
+# Traits and impls end at the first closing brace at the start of a line (for impls, one with
+# nothing but whitespace after it); the patterns locate the header and the end is found forward
+# from there, so no pattern has to scan a body lazily.
+TRAIT_RE = re.compile(rb'pub trait ([\w\x80-\xff]+)(?:[^{]*)\{')
+IMPL_RE = re.compile(rb'impl\s+(?:([\w\x80-\xff]+)\s+for\s+)?([\w\x80-\xff]+)\s*\{')
+IMPL_END_RE = re.compile(rb'\n\}[^\S\n]*(?:\n|\Z)')
+
+# Newlines, collected in C by finditer rather than a Python-level find loop
+NEWLINE_RE = re.compile(rb'\n')
+
+# Whole-line /// doc comments, with the comment text
+DOC_LINE_RE = re.compile(rb'^[^\S\n]*///([^\n]*)', re.MULTILINE)
+
+# Braces, plus the comments and literals whose braces must not be counted
+BRACE_TOKEN_RE = re.compile(rb'//[^\n]*|/\*.*?\*/|"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])\'|[{}]', re.DOTALL)
+
+# Members of those items, scanned across the whole body; each must start a line and stay on it
+VARIANT_RE = re.compile(rb'^[^\S\n]*([A-Z][\w\x80-\xff]*)(\([^)\n]*\)|\{[^}\n]*\})?', re.MULTILINE)
+TRAIT_FN_RE = re.compile(rb'^[^\S\n]*(fn [^\S\n]*([\w\x80-\xff]+)[^\S\n]*\([^)\n]*\)(?:[^\S\n]*->[^\S\n]*\S+)?)', re.MULTILINE)
+IMPL_FN_RE = re.compile(rb'^[^\S\n]*((?:pub )?fn [^\S\n]*([\w\x80-\xff]+)[^\S\n]*\([^)\n]*\)(?:[^\S\n]*->[^\S\n]*\S+)?)', re.MULTILINE)
+
+# Struct fields can span lines, so they are matched against accumulated field text
+FIELD_RE = re.compile(rb'(pub\s+)?([\w\x80-\xff]+)\s*:\s*([^,}]+)')
+
+def block_end(content, open_pos):
+    """Return the offset of the brace closing the block opened at open_pos, or -1 if there is none.
+
+    Braces inside comments, string literals and char literals are not counted.
+    """
+    depth = 0
+    for token in BRACE_TOKEN_RE.finditer(content, open_pos):
+        if token.group() == b'{':
+            depth += 1
+        elif token.group() == b'}':
+            depth -= 1
+            if depth == 0:
+                return token.start()
+    return -1
 
 def generate_map(file_path):
-    """Generate complete map of Rust source file."""
-
-    with open(file_path, 'r') as f:
-        content = f.read()
-
-    print('=' * 100)
-    print(f'📄 COMPLETE SOURCE MAP: {file_path}')
-    print('=' * 100)
+    """Generate complete map of Rust source file and return it as text."""
+
+    # Map the file instead of reading and decoding it whole; only matched text is decoded
+    with open(file_path, 'rb') as f:
+        try:
+            content = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (ValueError, OSError):
+            # Empty files and pipes cannot be mapped
+            content = f.read()
+
+    # Match offsets are mapped to lines by bisecting the newline offsets
+    newline_offsets = [newline.start() for newline in NEWLINE_RE.finditer(content)]
+
+    def line_number(offset):
+        """Return the 1-based line number of a byte offset."""
+        return bisect_right(newline_offsets, offset) + 1
+
+    # Doc comment lines are indexed once, by line, so lookups only bisect
+    doc_comments = {
+        bisect_left(newline_offsets, doc_match.start()): doc_match.group(1)
+        for doc_match in DOC_LINE_RE.finditer(content)
+    }
+    doc_line_indices = list(doc_comments)
+
+    def preceding_doc(offset):
+        """Return the nearest /// doc comment within the four lines before offset (or earlier on its line)."""
+        line_index = bisect_left(newline_offsets, offset)
+        line_start = newline_offsets[line_index - 1] + 1 if line_index else 0
+        line = content[line_start:offset].strip()
+        if line.startswith(b'///'):
+            return line[3:].strip().decode('utf-8')
+
+        # Otherwise take the last indexed doc comment line among the four lines above
+        i = bisect_left(doc_line_indices, line_index) - 1
+        if i >= 0 and doc_line_indices[i] >= line_index - 4:
+            return doc_comments[doc_line_indices[i]].strip().decode('utf-8')
+        return None
+
+    # Collect output lines and join them once at the end
+    out = []
+    out.append('=' * 100)
+    out.append(f'📄 COMPLETE SOURCE MAP: {file_path}')
+    out.append('=' * 100)
 
     # Extract all enums
-    print('\n' + '─' * 100)
-    print('📦 ENUMS')
-    print('─' * 100)
+    out.append('\n' + '─' * 100)
+    out.append('📦 ENUMS')
+    out.append('─' * 100)
 
-    enum_pattern = r'(?:///[^\n]*\n)*(?:#\[[^\]]*\]\n)*pub enum (\w+)[^{]*\{([^}]*(?:\{[^}]*\}[^}]*)*)\}'
-    for match in re.finditer(enum_pattern, content, re.MULTILINE | re.DOTALL):
-        name = match.group(1)
-        body = match.group(2)
+    pos = 0
+    while match := ENUM_RE.search(content, pos):
+        body_end = block_end(content, match.end() - 1)
+        if body_end == -1:
+            break
+        pos = body_end + 1
 
-        line_num = content[:match.start()].count('\n') + 1
+        name = match.group(1).decode('utf-8')
+        body = content[match.end():body_end]
 
-        # Extract doc comment
-        lines_before = content[:match.start()].split('\n')
-        doc = None
-        for line in reversed(lines_before[-5:]):
-            if line.strip().startswith('///'):
-                doc = line.strip()[3:].strip()
-                break
+        line_num = line_number(match.start())
+        doc = preceding_doc(match.start())
 
-        print(f'\n🔹 {name} (line {line_num})')
+        out.append(f'\n🔹 {name} (line {line_num})')
         if doc:
-            print(f'   📝 {doc}')
+            out.append(f'   📝 {doc}')
 
         # Extract variants
         variants = []
-        for line in body.split('\n'):
-            line = line.strip()
-            if line and not line.startswith('//') and not line.startswith('#['):
-                variant_match = re.match(r'([A-Z]\w*)(\([^)]*\)|\{[^}]*\})?', line)
-                if variant_match:
-                    variant = variant_match.group(1)
-                    if variant_match.group(2):
-                        variant += variant_match.group(2).replace('\n', '').replace('  ', ' ')
-                    variants.append(variant)
-
-        print('   Variants:')
+        for variant_match in VARIANT_RE.finditer(body):
+            variant = variant_match.group(1)
+            if variant_match.group(2):
+                variant += variant_match.group(2).replace(b'  ', b' ')
+            variants.append(variant.decode('utf-8'))
+
+        out.append('   Variants:')
         for v in variants:
-            print(f'      • {v}')
+            out.append(f'      • {v}')
 
     # Extract all structs
-    print('\n' + '─' * 100)
-    print('🏗️  STRUCTS')
-    print('─' * 100)
+    out.append('\n' + '─' * 100)
+    out.append('🏗️  STRUCTS')
+    out.append('─' * 100)
 
-    struct_pattern = r'(?:///[^\n]*\n)*pub struct (\w+)[^{]*\{([^}]*(?:\{[^}]*\}[^}]*)*?)\}'
-    for match in re.finditer(struct_pattern, content, re.MULTILINE | re.DOTALL):
-        name = match.group(1)
+    for match in STRUCT_RE.finditer(content):
+        name = match.group(1).decode('utf-8')
         body = match.group(2)
 
-        line_num = content[:match.start()].count('\n') + 1
+        line_num = line_number(match.start())
+        doc = preceding_doc(match.start())
 
-        # Extract doc
-        lines_before = content[:match.start()].split('\n')
-        doc = None
-        for line in reversed(lines_before[-5:]):
-            if line.strip().startswith('///'):
-                doc = line.strip()[3:].strip()
-                break
-
-        print(f'\n🔹 {name} (line {line_num})')
+        out.append(f'\n🔹 {name} (line {line_num})')
         if doc:
-            print(f'   📝 {doc}')
+            out.append(f'   📝 {doc}')
 
         # Extract fields
         fields = []
-        current_field = ''
-        for line in body.split('\n'):
+        current_field = []
+        for line in body.split(b'\n'):
             line = line.strip()
-            if not line or line.startswith('//') or line.startswith('#['):
+            if not line or line.startswith(b'//') or line.startswith(b'#['):
                 continue
 
-            current_field += ' ' + line
-            if ',' in line or '}' in line:
-                field_match = re.search(r'(pub\s+)?(\w+)\s*:\s*([^,}]+)', current_field)
+            current_field.append(line)
+            if b',' in line or b'}' in line:
+                field_match = FIELD_RE.search(b' '.join(current_field))
                 if field_match:
                     visibility = 'pub ' if field_match.group(1) else ''
-                    field_name = field_match.group(2)
-                    field_type = field_match.group(3).strip()
+                    field_name = field_match.group(2).decode('utf-8')
+                    field_type = field_match.group(3).strip().decode('utf-8')
                     fields.append(f'{visibility}{field_name}: {field_type}')
-                current_field = ''
+                current_field.clear()
 
         if fields:
-            print('   Fields:')
+            out.append('   Fields:')
             for f in fields:
-                print(f'      • {f}')
+                out.append(f'      • {f}')
 
     # Extract all traits
-    print('\n' + '─' * 100)
-    print('🎯 TRAITS')
-    print('─' * 100)
+    out.append('\n' + '─' * 100)
+    out.append('🎯 TRAITS')
+    out.append('─' * 100)
 
-    trait_pattern = r'pub trait (\w+)(?:[^{]*)\{(.*?)\n\}'
-    for match in re.finditer(trait_pattern, content, re.MULTILINE | re.DOTALL):
-        name = match.group(1)
-        body = match.group(2)
+    pos = 0
+    while match := TRAIT_RE.search(content, pos):
+        body_end = content.find(b'\n}', match.end())
+        if body_end == -1:
+            break
+        pos = body_end + 2
 
-        line_num = content[:match.start()].count('\n') + 1
+        name = match.group(1).decode('utf-8')
+        body = content[match.end():body_end]
 
-        # Extract doc
-        lines_before = content[:match.start()].split('\n')
-        doc = None
-        for line in reversed(lines_before[-5:]):
-            if line.strip().startswith('///'):
-                doc = line.strip()[3:].strip()
-                break
+        line_num = line_number(match.start())
+        doc = preceding_doc(match.start())
 
-        print(f'\n🔹 {name} (line {line_num})')
+        out.append(f'\n🔹 {name} (line {line_num})')
         if doc:
-            print(f'   📝 {doc}')
+            out.append(f'   📝 {doc}')
 
         # Extract method signatures - simplified
-        print('   Methods:')
-        for line in body.split('\n'):
-            line = line.strip()
-            if line.startswith('fn '):
-                # Extract just fn name and basic signature
-                fn_match = re.match(r'fn\s+(\w+)\s*\([^)]*\)(?:\s*->\s*\S+)?', line)
-                if fn_match:
-                    print(f'      • {fn_match.group(0)};')
+        out.append('   Methods:')
+        # Extract just fn name and basic signature
+        for fn_match in TRAIT_FN_RE.finditer(body):
+            out.append(f"      • {fn_match.group(1).decode('utf-8')};")
 
     # Extract all impl blocks
-    print('\n' + '─' * 100)
-    print('⚙️  IMPLEMENTATIONS')
-    print('─' * 100)
+    out.append('\n' + '─' * 100)
+    out.append('⚙️  IMPLEMENTATIONS')
+    out.append('─' * 100)
 
-    impl_pattern = r'impl\s+(?:(\w+)\s+for\s+)?(\w+)\s*\{(.*?)\n\}(?:\s*\n|\s*$)'
-    for match in re.finditer(impl_pattern, content, re.MULTILINE | re.DOTALL):
-        trait_name = match.group(1)
-        type_name = match.group(2)
-        body = match.group(3)
+    pos = 0
+    while match := IMPL_RE.search(content, pos):
+        end_match = IMPL_END_RE.search(content, match.end())
+        if not end_match:
+            break
+        pos = end_match.end()
 
-        line_num = content[:match.start()].count('\n') + 1
+        trait_name = match.group(1) and match.group(1).decode('utf-8')
+        type_name = match.group(2).decode('utf-8')
+        body = content[match.end():end_match.start()]
+
+        line_num = line_number(match.start())
 
         if trait_name:
-            print(f'\n🔹 impl {trait_name} for {type_name} (line {line_num})')
+            out.append(f'\n🔹 impl {trait_name} for {type_name} (line {line_num})')
         else:
-            print(f'\n🔹 impl {type_name} (line {line_num})')
+            out.append(f'\n🔹 impl {type_name} (line {line_num})')
 
         # Extract methods - skip tests
-        print('   Methods:')
-        for line in body.split('\n'):
-            line = line.strip()
-            if line.startswith('pub fn ') or line.startswith('fn '):
-                method_match = re.match(r'(pub\s+)?fn\s+(\w+)\s*\([^)]*\)(?:\s*->\s*\S+)?', line)
-                if method_match:
-                    method_name = method_match.group(2)
-                    if not method_name.startswith('test_'):
-                        print(f'      • {method_match.group(0)}')
-
-    print('\n' + '=' * 100)
+        out.append('   Methods:')
+        for method_match in IMPL_FN_RE.finditer(body):
+            if not method_match.group(2).startswith(b'test_'):
+                out.append(f"      • {method_match.group(1).decode('utf-8')}")
+
+    out.append('\n' + '=' * 100)
+    return '\n'.join(out) + '\n'
+
+def cached_map(file_path):
+    """Return the map of a Rust source file, reusing the cached map while the file is unchanged."""
+    source = os.stat(file_path)
+    script = os.stat(__file__)
+    # The map's header shows the path as given, so that is part of the key along with the file it resolves to
+    key = hashlib.blake2b(
+        f'{os.path.abspath(file_path)}:{file_path}:{source.st_mtime_ns}:{source.st_size}:{script.st_mtime_ns}'.encode()
+    ).hexdigest()
+    cache_file = CACHE_DIR / f'{key}.txt'
+
+    try:
+        output = cache_file.read_text(encoding='utf-8')
+        os.utime(cache_file)  # Mark as recently used
+        return output
+    except OSError:
+        pass
+
+    output = generate_map(file_path)
+
+    # Caching is best effort; write atomically so concurrent runs never read a partial map
+    try:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        tmp_file = CACHE_DIR / f'{key}.{os.getpid()}.tmp'
+        tmp_file.write_text(output, encoding='utf-8')
+        os.replace(tmp_file, cache_file)
+
+        cached_files = sorted(CACHE_DIR.glob('*.txt'), key=lambda cached: cached.stat().st_mtime)
+        for stale_file in cached_files[:-CACHE_MAX_ENTRIES]:
+            stale_file.unlink()
+    except OSError:
+        pass
+
+    return output
+
+def map_many(paths):
+    """Yield the map of each Rust source file in paths, in order, mapping files in parallel."""
+    paths = list(paths)
+    if len(paths) < 2:
+        yield from map(cached_map, paths)
+        return
+
+    # Each file is mapped independently, so spread the regex work across processes
+    with ProcessPoolExecutor() as executor:
+        yield from executor.map(cached_map, paths)
 
 if __name__ == "__main__":
     if len(sys.argv) < 2:
-        print("Usage: python3 scripts/source-map.py <rust_file_path>")
+        print("Usage: python3 scripts/source-map.py <rust_file_path> [<rust_file_path> ...]")
         print("\nExample:")
         print("  python3 scripts/source-map.py src/app/dashui/keyboard_navigation.rs")
         sys.exit(1)
 
-    file_path = sys.argv[1]
-    generate_map(file_path)
+    for output in map_many(sys.argv[1:]):
+        sys.stdout.write(output)